@@ -0,0 +1,48 @@
+import hashlib
+import json
+from dataclasses import asdict, is_dataclass
+from datetime import date, datetime
+
+from flask import Response, request
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+#----------------------------------------------------------------------------#
+# JSON API helpers.
+#----------------------------------------------------------------------------#
+
+def default(value):
+    #Serializes what the encoder does not know natively: result rows, and
+    # with the standard library encoder also the response records and datetimes
+    if hasattr(value, '_asdict'):
+        return value._asdict()
+    if is_dataclass(value):
+        return asdict(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError('{!r} is not JSON serializable'.format(value))
+
+def dumps(value):
+    #Encodes value as compact JSON bytes with orjson (see requirements.txt),
+    # or with the standard library encoder where orjson is not installed
+    if orjson is not None:
+        return orjson.dumps(value, default=default)
+    return json.dumps(value, default=default, separators=(',', ':')).encode()
+
+def json_response(value, status=200, etag=True):
+    #Builds a JSON response carrying a strong ETag of its body. A GET whose
+    # If-None-Match matches the ETag gets an empty 304 instead. Routes that
+    # tag the response from the DB state before building it pass etag=False
+    body = dumps(value)
+    response = Response(body, status=status, mimetype='application/json')
+    if status == 200 and etag:
+        response.set_etag(hashlib.blake2b(body, digest_size=16).hexdigest())
+        response.cache_control.no_cache = True
+        response.make_conditional(request)
+    return response
+
+def api_error(status, message):
+    return json_response({'error': message}, status=status)
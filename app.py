@@ -4,89 +4,303 @@
 
 import logging
 import sys
+from datetime import datetime, timezone
+from itertools import groupby
 from logging import FileHandler, Formatter
-
-import babel
-import dateutil.parser
-from flask import Flask, flash, redirect, render_template, request, url_for
-from flask_migrate import Migrate
+from operator import attrgetter
+
+import click
+from flask import (
+    Blueprint,
+    Flask,
+    Response,
+    abort,
+    current_app,
+    flash,
+    jsonify,
+    redirect,
+    render_template,
+    request,
+    stream_with_context,
+    url_for,
+)
 from flask_moment import Moment
 
-from model import *
-from forms import *
+from model import (
+    Area,
+    Artist,
+    ArtistResponse,
+    ArtistShowResponse,
+    Show,
+    Shows,
+    Venue,
+    VenueResponse,
+    VenueShowResponse,
+    VenueStats,
+    db,
+    load_profile,
+    profile_columns,
+    utcnow,
+)
+from filters import format_datetime
+import dbpool
+from api import api_error, json_response
+from cache import artist_key, cached, make_cache, venue_key
+from conditional import as_utc, conditional, entity_tag
+from feed import init_feed
+from fragments import init_fragment_cache
+from exporter import FORMATS as EXPORT_FORMATS, export, export_command
+from importer import import_command
+from jobs import init_jobs, job
+from pagination import ARTIST_SORTS, KeysetPage, artist_directory, keyset_page, row_key
+from querylog import init_query_log
+from search import browse, search
+from stats import refresh_show_stats, update_show_stats
 
 # ----------------------------------------------------------------------------#
 # App Config.
 # ----------------------------------------------------------------------------#
 
-app = Flask(__name__)
-moment = Moment(app)
-app.config.from_object("config")
-db.init_app(app)
-migrate = Migrate(app, db)
+#The views and error handlers below are registered on this blueprint, and it
+# on each app create_app builds. An empty name leaves the endpoints
+# unprefixed ("venues", not "fyyur.venues"), so url_for calls and the
+# templates asgi.py shares stay the same
+views = Blueprint("", __name__)
+
+
+def create_app(config="config"):
+    #Builds the Fyyur app from the config module or object
+    app = Flask(__name__)
+    Moment(app)
+    app.config.from_object(config)
+    db.init_app(app)
+    app.extensions["cache"] = make_cache(app.config)
+    init_query_log(app)
+    init_fragment_cache(app)
+    init_feed(app)
+    init_jobs(app).every(app.config["SHOW_STATS_REFRESH_INTERVAL"], "refresh_show_stats")
+    app.jinja_env.filters["datetime"] = format_datetime
+    app.cli.add_command(import_command)
+    app.cli.add_command(export_command)
+    app.register_blueprint(views)
+    # Flask-Migrate pulls in all of alembic, so it is only set up when the
+    # flask command (e.g. flask db upgrade) is the one creating the app
+    if click.get_current_context(silent=True) is not None:
+        from flask_migrate import Migrate
+        Migrate(app, db)
+    if not app.debug:
+        init_error_log(app)
+    return app
+
+
+def init_error_log(app):
+    #error.log is only opened when the first record is written
+    file_handler = FileHandler("error.log", delay=True)
+    file_handler.setFormatter(
+        Formatter("%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]")
+    )
+    app.logger.setLevel(logging.INFO)
+    file_handler.setLevel(logging.INFO)
+    app.logger.addHandler(file_handler)
 
 # ----------------------------------------------------------------------------#
-# Filters.
+# Helpers.
 # ----------------------------------------------------------------------------#
 
 
-def format_datetime(value, format="medium"):
-    date = dateutil.parser.parse(value)
-    if format == "full":
-        format = "EEEE MMMM, d, y 'at' h:mma"
-    elif format == "medium":
-        format = "EE MM, dd, y h:mma"
-    return babel.dates.format_datetime(date, format, locale="en")
+def listing_version_statement(model):
+    #Selects the row count and latest updated_at of venues or artists, which
+    # together change whenever their listing does
+    return db.select(db.func.count(model.id), db.func.max(model.updated_at))
+
+
+def listing_version(model):
+    #Output = (row count, latest updated_at)
+    return db.session.execute(listing_version_statement(model)).one()
+
+
+def page_version_statement(model, key_column, key, now):
+    #Selects what decides whether the details page of a venue or artist
+    # changed: its updated_at and the start of its latest past show, since
+    # the page also changes when a show moves from upcoming to past
+    last_show = (
+        db.select(db.func.max(Show.start_time))
+        .where(key_column == key, Show.start_time <= now)
+        .scalar_subquery()
+    )
+    return db.select(model.updated_at, last_show).where(model.id == key)
+
+
+def page_version(model, key_column, key, now):
+    #Output = (etag, last_modified), or None when it does not exist
+    return version_of(model, key, db.session.execute(page_version_statement(model, key_column, key, now)).first())
+
+
+def version_of(model, key, row):
+    #Output = (etag, last_modified) of a page_version_statement row, or None
+    # when there is no row. The etag also versions the cached page
+    if row is None:
+        return None
+    updated_at, last_show = as_utc(row[0]), as_utc(row[1])
+    last_modified = max(updated_at, last_show) if last_show else updated_at
+    return entity_tag(model.__tablename__, key, updated_at, last_modified), last_modified
+
+
+def touch(model, ids, now):
+    #Bumps updated_at of the venues or artists whose pages changed, ids is a
+    # list or a query of ids
+    model.query.filter(model.id.in_(ids)).update({model.updated_at: now}, synchronize_session=False)
+
+
+def get_cache():
+    #Output = the venue and artist detail cache of the current app
+    return current_app.extensions["cache"]
+
+
+def home_feed():
+    #Output = the home page feed of the current app
+    return current_app.extensions["feed"]
+
+
+def enqueue(name, **kwargs):
+    #Hands the job called name to the background job runner of the app
+    current_app.extensions["jobs"].enqueue(name, **kwargs)
+
+
+def invalidate_venue(venue_id):
+    #Drops the cached page of a venue now and leaves the pages of the
+    # artists showing there to a background job
+    get_cache().delete(venue_key(venue_id))
+    home_feed().changed()
+    enqueue("venue_changed", venue_id=venue_id)
+
+
+def invalidate_artist(artist_id):
+    #Drops the cached page of an artist now and leaves the pages of the
+    # venues they play at to a background job
+    get_cache().delete(artist_key(artist_id))
+    home_feed().changed()
+    enqueue("artist_changed", artist_id=artist_id)
+
+
+@job("refresh_show_stats")
+def refresh_stats():
+    #Moves the shows that started since the last run from the upcoming to the
+    # past counts, and marks the pages showing those counts as changed
+    now = utcnow()
+    venue_ids = refresh_show_stats(Venue, now)
+    artist_ids = refresh_show_stats(Artist, now)
+    touch(Venue, venue_ids, now)
+    touch(Artist, artist_ids, now)
+    db.session.commit()
+    get_cache().delete(
+        *[venue_key(venue_id) for venue_id in venue_ids],
+        *[artist_key(artist_id) for artist_id in artist_ids],
+    )
+
+
+@job("venue_changed")
+def venue_changed(venue_id):
+    #Marks the pages of every artist showing at a venue as changed, since
+    # artist pages list the venue's name and image
+    artist_ids = [
+        artist_id
+        for artist_id, in db.session.query(Show.artist_id).filter(Show.venue_id == venue_id).distinct()
+    ]
+    touch(Artist, artist_ids, utcnow())
+    db.session.commit()
+    get_cache().delete(*[artist_key(artist_id) for artist_id in artist_ids])
+
+
+@job("artist_changed")
+def artist_changed(artist_id):
+    #Marks the pages of every venue an artist plays at as changed
+    venue_ids = [
+        venue_id
+        for venue_id, in db.session.query(Show.venue_id).filter(Show.artist_id == artist_id).distinct()
+    ]
+    touch(Venue, venue_ids, utcnow())
+    db.session.commit()
+    get_cache().delete(*[venue_key(venue_id) for venue_id in venue_ids])
+
+
+def venue_areas():
+    #All venues are read by one ordered query and grouped in Python, so the
+    # list costs a single round trip no matter how many areas exist
+    #Output = list of Area, each with the rows of its venues
+    rows = (
+        db.session.query(
+            *profile_columns(Venue, "listing"),
+            db.func.coalesce(VenueStats.upcoming_shows_count, 0).label("upcoming_shows_count"),
+        )
+        .outerjoin(VenueStats, VenueStats.id == Venue.id)
+        .order_by(Venue.state, Venue.city, Venue.id)
+        .yield_per(1000)
+    )
+    return [
+        Area(city=city, state=state, venues=list(group))
+        for (city, state), group in groupby(rows, key=attrgetter("city", "state"))
+    ]
 
 
-app.jinja_env.filters["datetime"] = format_datetime
+def stream_template(template_name, **context):
+    #Renders a template chunk by chunk, so the first bytes reach the client
+    # before the last row has been read from the DB
+    current_app.update_template_context(context)
+    stream = current_app.jinja_env.get_template(template_name).stream(context)
+    stream.enable_buffering(5)
+    return Response(stream_with_context(stream))
 
 # ----------------------------------------------------------------------------#
 # Controllers.
 # ----------------------------------------------------------------------------#
 
 
-@app.route("/")
+def render_home():
+    #Renders the home page from the feed snapshot, without querying the DB
+    feed = home_feed().get()
+    return render_template(
+        "pages/home.html",
+        upcoming_shows=feed.upcoming(datetime.now(timezone.utc)),
+        recent_venues=feed.venues,
+        recent_artists=feed.artists,
+    )
+
+
+@views.route("/")
 def index():
-    return render_template("pages/home.html")
+    return render_home()
 
 # ----------------------------------------------------------------------------#
 #  Venues
 #  ----------------------------------------------------------------
 
 
-@app.route("/venues")
+@views.route("/venues")
 
 def venues():
     #This endpoint will list Venues grouped by City and State
     # called when user clicks on 'Venue' or 'Find a Venue' button
     #List venues in groups bu City and State
-    statement = db.session.query(Venue.city, Venue.state).group_by(
-        Venue.city, Venue.state
+    #Deleting a venue changes the count but no updated_at, so the listing is
+    # only validated by its ETag
+    count, updated_at = listing_version(Venue)
+    return conditional(
+        entity_tag("venues", count, updated_at),
+        None,
+        lambda: render_template("pages/venues.html", areas=venue_areas()),
     )
-    venueslist = db.session.execute(statement)
-    areas = []
-    for venue in venueslist:
-        area = Area(
-            city=venue.city,
-            state=venue.state,
-            venues=Venue.query.filter_by(city=venue.city, state=venue.state),
-        )
-        areas.append(area)
-    return render_template("pages/venues.html", areas=areas)
 
 
-@app.route("/venues/search", methods=["POST"])
+@views.route("/venues/search", methods=["POST"])
 def search_venues():
     #This endpoint perform search on Venues based on the search term
-    #Input= searchTerm
-    #Output = List of venues that match the search term partially and case-insensitive
+    #Input= searchTerm and optional page number
+    #Output = List of venues whose name or city match the search term partially
+    # and case-insensitive, or whose state or genre is the search term
     searchTerm = request.form.get("search_term")
-    search = "%{}%".format(searchTerm)
-    query = db.session.query(Venue.id, Venue.name).filter(Venue.name.ilike(search))
-    data = query.all()
-    count = query.count()
-    response = SearchResponse(count=count, data=data)
+    page = request.form.get("page", 1, type=int)
+    response = search(Venue, searchTerm, current_app.config["SEARCH_RESULTS_LIMIT"], page=page)
 
     return render_template(
         "pages/search_venues.html",
@@ -95,31 +309,38 @@ def search_venues():
     )
 
 
-@app.route("/venues/<int:venue_id>")
-def show_venue(venue_id):
-    #This endpoint will display the details of the Venue given venue_id
-    #Input= venue_id
-    #Output = Details of a venue with Past and Upcoming shows
-
-    data = Venue.query.get(venue_id)
-    results = db.session.query(Show,Artist.image_link,Artist.id,Artist.name).filter_by(venue_id=venue_id).join(Artist).all()
-    past_shows =[]
-    upcoming_shows = []
-    for show in results:
-        showdata = VenueShowResponse(
+def venue_response(venue_id):
+    #Builds the VenueResponse shown on the details page of a venue
+    #Output = VenueResponse, or None when the venue does not exist
+    data = Venue.query.options(load_profile(Venue, "detail")).get(venue_id)
+    if data is None:
+        return None
+    now = datetime.now(timezone.utc)
+    shows = db.session.query(
+        *profile_columns(Artist, "tile"), Show.start_time
+    ).join(Show, Show.artist_id == Artist.id).filter(Show.venue_id == venue_id)
+    past_shows = [
+        VenueShowResponse(
             artist_image_link=show.image_link,
             artist_id=show.id,
             artist_name=show.name,
             start_time=show.start_time,
+            artist_updated_at=show.updated_at,
         )
-        if datetime.strptime(show.start_time, "%Y-%m-%d %H:%M:%S") <= datetime.now():
-            past_shows.append(showdata)
-        else:
-            upcoming_shows.append(showdata)
-    upcoming_shows_count = len(upcoming_shows)
-    past_shows_count = len(past_shows)
-    
-    response = VenueResponse(
+        for show in shows.filter(Show.start_time <= now).order_by(Show.start_time.desc())
+    ]
+    upcoming_shows = [
+        VenueShowResponse(
+            artist_image_link=show.image_link,
+            artist_id=show.id,
+            artist_name=show.name,
+            start_time=show.start_time,
+            artist_updated_at=show.updated_at,
+        )
+        for show in shows.filter(Show.start_time > now).order_by(Show.start_time)
+    ]
+
+    return VenueResponse(
         id=data.id,
         name=data.name,
         city=data.city,
@@ -132,29 +353,51 @@ def show_venue(venue_id):
         website=data.website_link,
         seeking_talent=data.seeking_talent,
         seeking_description=data.seeking_description,
-        upcoming_shows_count=upcoming_shows_count,
+        upcoming_shows_count=len(upcoming_shows),
         upcoming_shows=upcoming_shows,
-        past_shows_count=past_shows_count,
+        past_shows_count=len(past_shows),
         past_shows=past_shows,
     )
 
-    return render_template("pages/show_venue.html", venue=response)
+
+@views.route("/venues/<int:venue_id>")
+def show_venue(venue_id):
+    #This endpoint will display the details of the Venue given venue_id
+    #Input= venue_id
+    #Output = Details of a venue with Past and Upcoming shows
+    #Responses are cached per venue until it or its shows change, and
+    # answered with 304 when the client's copy is still current
+    version = page_version(Venue, Show.venue_id, venue_id, datetime.now(timezone.utc))
+    if version is None:
+        abort(404)
+    etag, last_modified = version
+
+    def render():
+        response = cached(get_cache(), venue_key(venue_id), lambda: venue_response(venue_id), etag)
+        if response is None:
+            abort(404)
+        return render_template("pages/show_venue.html", venue=response)
+
+    return conditional(etag, last_modified, render)
 
 # ----------------------------------------------------------------------------#
 #  Create Venue
 #  ----------------------------------------------------------------
 
 
-@app.route("/venues/create", methods=["GET"])
+@views.route("/venues/create", methods=["GET"])
 def create_venue_form():
     #This endpoint will display a form that will input all the 
     # details of a new Venue
     #Output = Form to input details of a new Venue
+    # forms (WTForms) are imported by the views that use them, which keeps
+    # them out of the startup of every worker
+    from forms import VenueForm
     form = VenueForm()
     return render_template("forms/new_venue.html", form=form)
 
 
-@app.route("/venues/create", methods=["POST"])
+@views.route("/venues/create", methods=["POST"])
 def create_venue_submission():
     #This endpoint will submit the VenueForm and 
     # will create a new Venue in DB
@@ -162,6 +405,7 @@ def create_venue_submission():
     #Output = Redirects to Home page on successful 
     # creation of the venue
 
+    from forms import VenueForm
     error = False
     name = ""
     try:
@@ -185,6 +429,7 @@ def create_venue_submission():
         )
         db.session.add(venue)
         db.session.commit()
+        home_feed().changed()
     except:
         db.session.rollback()
         error = True
@@ -196,28 +441,30 @@ def create_venue_submission():
         flash("An error occurred. Venue " + form.name.data + " could not be listed.")
     else:
         flash("Venue " + form.name.data + " was successfully listed!")
-    return render_template("pages/home.html")
+    return render_home()
 
 
-@app.route("/venues/<int:venue_id>/edit", methods=["GET"])
+@views.route("/venues/<int:venue_id>/edit", methods=["GET"])
 def edit_venue(venue_id):
     #This endpoint will display a form that will  display
     # details of the Venue for given venue_id prefilled
     #Output = Form to input details to edit the Venue
-    venue = Venue.query.get(venue_id)
+    from forms import VenueForm
+    venue = Venue.query.options(load_profile(Venue, "edit-form")).get(venue_id)
     form = VenueForm(obj=venue)
     return render_template("forms/edit_venue.html", form=form, venue=venue)
 
 
-@app.route("/venues/<int:venue_id>/edit", methods=["POST"])
+@views.route("/venues/<int:venue_id>/edit", methods=["POST"])
 def edit_venue_submission(venue_id):
     #This endpoint will submit the VenueForm and 
     # will edit the Venue for the given venue_id in DB
     #Input = VenueForm and venue_id
     #Output = Displays the Venue details page for given venue_id with 
     #editted data
+    from forms import VenueForm
     form = VenueForm(request.form)
-    venue = Venue.query.get(venue_id)
+    venue = Venue.query.options(load_profile(Venue, "edit-form")).get(venue_id)
     venue.name = form.name.data
     venue.city = form.city.data
     venue.state = form.state.data
@@ -233,20 +480,23 @@ def edit_venue_submission(venue_id):
         venue.seeking_talent = False
     venue.seeking_description = form.seeking_description.data
     db.session.merge(venue)
+    touch(Venue, [venue_id], datetime.now(timezone.utc))
     db.session.commit()
+    invalidate_venue(venue_id)
     return redirect(url_for("show_venue", venue_id=venue_id))
 
 
-@app.route("/venues/<int:venue_id>/delete", methods=["GET"])
+@views.route("/venues/<int:venue_id>/delete", methods=["GET"])
 def delete_venue(venue_id):
     #This endpoint will display a form that will provide the button  
     # delete a venue
-    venue = Venue.query.get(venue_id)
+    from forms import VenueForm
+    venue = Venue.query.options(load_profile(Venue, "edit-form")).get(venue_id)
     form = VenueForm(obj=venue)
     return render_template("forms/delete_venue.html", form=form, venue=venue)
 
 
-@app.route("/venues/<int:venue_id>/delete", methods=["POST"])
+@views.route("/venues/<int:venue_id>/delete", methods=["POST"])
 def delete_venue_submission(venue_id):
     #This endpoint will submit the VenueForm and 
     # will delete the Venue for the given venue_id in DB
@@ -257,6 +507,7 @@ def delete_venue_submission(venue_id):
         deleted_objects = Venue.__table__.delete().where(Venue.id.in_([venue_id]))
         db.session.execute(deleted_objects)
         db.session.commit()
+        invalidate_venue(venue_id)
 
     except:
         db.session.rollback()
@@ -275,27 +526,42 @@ def delete_venue_submission(venue_id):
 # ----------------------------------------------------------------------------#
 #  Artists
 #  ----------------------------------------------------------------
-@app.route("/artists")
+@views.route("/artists")
 def artists():
     #This endpoint will list Artists from DB
     # called when user clicks on 'Artist' or 'Find a Artist' button
-
-    artists = Artist.query.order_by("id").all()
-    return render_template("pages/artists.html", artists=artists)
+    #Input = optional sort (name, city or recent) and cursor of the next page
+    sort = request.args.get("sort", "name")
+    cursor = request.args.get("cursor")
+    per_page = current_app.config["ARTISTS_PER_PAGE"]
+    try:
+        statement, columns = artist_directory(sort, cursor, per_page)
+    except ValueError:
+        abort(400)
+
+    count, updated_at = listing_version(Artist)
+    return conditional(
+        entity_tag("artists", sort, cursor, count, updated_at),
+        updated_at,
+        lambda: render_template(
+            "pages/artists.html",
+            artists=KeysetPage(db.session.execute(statement), per_page, key=row_key(columns)),
+            sort=sort,
+            sorts=ARTIST_SORTS,
+        ),
+    )
 
 
-@app.route("/artists/search", methods=["POST"])
+@views.route("/artists/search", methods=["POST"])
 def search_artists():
     #This endpoint perform search on Artists based on the search term
-    #Input= searchTerm
-    #Output = List of Artists that match the search term partially and case-insensitive
+    #Input= searchTerm and optional page number
+    #Output = List of Artists whose name or city match the search term partially
+    # and case-insensitive, or whose state or genre is the search term
 
     searchTerm = request.form.get("search_term")
-    search = "%{}%".format(searchTerm)
-    query = db.session.query(Artist.id, Artist.name).filter(Artist.name.ilike(search))
-    data = query.all()
-    count = query.count()
-    response = SearchResponse(count=count, data=data)
+    page = request.form.get("page", 1, type=int)
+    response = search(Artist, searchTerm, current_app.config["SEARCH_RESULTS_LIMIT"], page=page)
     return render_template(
         "pages/search_artists.html",
         results=response,
@@ -303,30 +569,38 @@ def search_artists():
     )
 
 
-@app.route("/artists/<int:artist_id>")
-def show_artist(artist_id):
-    #This endpoint will display the details of the Artist given artist_id
-    #Input= artist_id
-    #Output = Details of a Artist with Past and Upcoming shows
-
-    results = db.session.query(Show,Venue.image_link,Venue.id,Venue.name).filter_by(artist_id=artist_id).join(Venue).all()
-    past_shows =[]
-    upcoming_shows = []
-    for show in results:
-        showdata = ArtistShowResponse(
+def artist_response(artist_id):
+    #Builds the ArtistResponse shown on the details page of an artist
+    #Output = ArtistResponse, or None when the artist does not exist
+    data = Artist.query.options(load_profile(Artist, "detail")).get(artist_id)
+    if data is None:
+        return None
+    now = datetime.now(timezone.utc)
+    shows = db.session.query(
+        *profile_columns(Venue, "tile"), Show.start_time
+    ).join(Show, Show.venue_id == Venue.id).filter(Show.artist_id == artist_id)
+    past_shows = [
+        ArtistShowResponse(
             venue_image_link=show.image_link,
             venue_id=show.id,
             venue_name=show.name,
             start_time=show.start_time,
+            venue_updated_at=show.updated_at,
         )
-        if datetime.strptime(show.start_time, "%Y-%m-%d %H:%M:%S") <= datetime.now():
-            past_shows.append(showdata)
-        else:
-            upcoming_shows.append(showdata)
-    upcoming_shows_count = len(upcoming_shows)
-    past_shows_count = len(past_shows)
-    data=Artist.query.get(artist_id)
-    response = ArtistResponse(
+        for show in shows.filter(Show.start_time <= now).order_by(Show.start_time.desc())
+    ]
+    upcoming_shows = [
+        ArtistShowResponse(
+            venue_image_link=show.image_link,
+            venue_id=show.id,
+            venue_name=show.name,
+            start_time=show.start_time,
+            venue_updated_at=show.updated_at,
+        )
+        for show in shows.filter(Show.start_time > now).order_by(Show.start_time)
+    ]
+
+    return ArtistResponse(
         id=data.id,
         name=data.name,
         city=data.city,
@@ -338,37 +612,58 @@ def show_artist(artist_id):
         website=data.website_link,
         seeking_venue=data.seeking_venue,
         seeking_description=data.seeking_description,
-        upcoming_shows_count=upcoming_shows_count,
+        upcoming_shows_count=len(upcoming_shows),
         upcoming_shows=upcoming_shows,
-        past_shows_count=past_shows_count,
+        past_shows_count=len(past_shows),
         past_shows=past_shows,
     )
 
-    return render_template("pages/show_artist.html", artist=response)
+
+@views.route("/artists/<int:artist_id>")
+def show_artist(artist_id):
+    #This endpoint will display the details of the Artist given artist_id
+    #Input= artist_id
+    #Output = Details of a Artist with Past and Upcoming shows
+    #Responses are cached per artist until it or its shows change, and
+    # answered with 304 when the client's copy is still current
+    version = page_version(Artist, Show.artist_id, artist_id, datetime.now(timezone.utc))
+    if version is None:
+        abort(404)
+    etag, last_modified = version
+
+    def render():
+        response = cached(get_cache(), artist_key(artist_id), lambda: artist_response(artist_id), etag)
+        if response is None:
+            abort(404)
+        return render_template("pages/show_artist.html", artist=response)
+
+    return conditional(etag, last_modified, render)
 
 # ----------------------------------------------------------------------------#
 #  Update
 #  ----------------------------------------------------------------
-@app.route("/artists/<int:artist_id>/edit", methods=["GET"])
+@views.route("/artists/<int:artist_id>/edit", methods=["GET"])
 def edit_artist(artist_id):
     #This endpoint will display a form that will  display
     # details of the Artist for given artist_id prefilled
     #Output = Form to input details to edit the Artist
 
-    artist = Artist.query.get(artist_id)
+    from forms import ArtistForm
+    artist = Artist.query.options(load_profile(Artist, "edit-form")).get(artist_id)
     form = ArtistForm(obj=artist)
     return render_template("forms/edit_artist.html", form=form, artist=artist)
 
 
-@app.route("/artists/<int:artist_id>/edit", methods=["POST"])
+@views.route("/artists/<int:artist_id>/edit", methods=["POST"])
 def edit_artist_submission(artist_id):
     #This endpoint will submit the ArtistForm and 
     # will edit the Artist for the given artist_id in DB
     #Input = ArtistForm and artist_id
     #Output = Displays the Artist details page for given artist_id with 
     #editted data
+    from forms import ArtistForm
     form = ArtistForm(request.form)
-    artist = Artist.query.get(artist_id)
+    artist = Artist.query.options(load_profile(Artist, "edit-form")).get(artist_id)
     artist.name = form.name.data
     artist.city = form.city.data
     artist.state = form.state.data
@@ -383,7 +678,9 @@ def edit_artist_submission(artist_id):
         artist.seeking_venue = False
     artist.seeking_description = form.seeking_description.data
     db.session.merge(artist)
+    touch(Artist, [artist_id], datetime.now(timezone.utc))
     db.session.commit()
+    invalidate_artist(artist_id)
 
     return redirect(url_for("show_artist", artist_id=artist_id))
 
@@ -392,17 +689,18 @@ def edit_artist_submission(artist_id):
 #  ----------------------------------------------------------------
 
 
-@app.route("/artists/create", methods=["GET"])
+@views.route("/artists/create", methods=["GET"])
 def create_artist_form():
     #This endpoint will display a form that will input all the 
     # details of a new Artist
     #Output = Form to input details of a new Artist
 
+    from forms import ArtistForm
     form = ArtistForm()
     return render_template("forms/new_artist.html", form=form)
 
 
-@app.route("/artists/create", methods=["POST"])
+@views.route("/artists/create", methods=["POST"])
 def create_artist_submission():
     #This endpoint will submit the ArtistForm and 
     # will create a new Artist in DB
@@ -410,6 +708,7 @@ def create_artist_submission():
     #Output = Redirects to Home page on successful 
     # creation of the artist
 
+    from forms import ArtistForm
     error = False
     name = ""
     try:
@@ -432,6 +731,7 @@ def create_artist_submission():
         )
         db.session.add(artist)
         db.session.commit()
+        home_feed().changed()
     except:
         db.session.rollback()
         error = True
@@ -443,57 +743,71 @@ def create_artist_submission():
         flash("An error occurred. Artist " + name + " could not be listed.")
     else:
         flash("Artist " + name + " was successfully listed!")
-    return render_template("pages/home.html")
+    return render_home()
 
 # ----------------------------------------------------------------------------#
 #  Shows
 #  ----------------------------------------------------------------
 
-@app.route("/shows")
+@views.route("/shows")
 def shows():
     #This endpoint will list Shows from DB
     # called when user clicks on 'Show' button
     #It displays Artist image and Venue details with Show timings
-    result = (
+    #Input = optional cursor of the next page and stream=1 to send the page
+    # to the client while it is being read from the DB
+    query = (
         db.session.query(
             Venue.name.label("venue_name"),
             Artist.name.label("artist_name"),
             Artist.image_link,
-            Show.c.venue_id,
-            Show.c.artist_id,
-            Show.c.start_time,
+            Show.id,
+            Show.venue_id,
+            Show.artist_id,
+            Show.start_time,
+            Venue.updated_at.label("venue_updated_at"),
+            Artist.updated_at.label("artist_updated_at"),
         )
-        .filter(Show.c.venue_id == Venue.id)
-        .filter(Show.c.artist_id == Artist.id)
-        .all()
+        .join(Venue, Show.venue_id == Venue.id)
+        .join(Artist, Show.artist_id == Artist.id)
     )
-    showData = []
-    for show in result:
-        showData.append(
-            Shows(
+    try:
+        page = keyset_page(
+            query,
+            (Show.start_time, Show.id),
+            cursor=request.args.get("cursor"),
+            per_page=current_app.config["SHOWS_PER_PAGE"],
+            wrap=lambda show: Shows(
                 show.venue_id,
                 show.venue_name,
                 show.artist_id,
                 show.artist_name,
                 show.image_link,
                 show.start_time,
-            )
+                show.venue_updated_at,
+                show.artist_updated_at,
+            ),
         )
+    except ValueError:
+        abort(400)
 
-    return render_template("pages/shows.html", shows=showData)
+    if request.args.get("stream"):
+        return stream_template("pages/shows.html", shows=page)
+    return render_template("pages/shows.html", shows=page)
 
 
-@app.route("/shows/create")
+@views.route("/shows/create")
 def create_shows():
     #This endpoint will display a form that will input all the 
     # details of a new Show
     #Output = Form to input details of a new Show
 
+    from forms import ShowForm
     form = ShowForm()
     return render_template("forms/new_show.html", form=form)
 
 
-@app.route("/shows/create", methods=["POST"])
+@views.route("/shows/create", methods=["POST"])
 def create_show_submission():
     #This endpoint will submit the ShowForm and 
     # will create a new Show in DB
@@ -501,24 +815,25 @@ def create_show_submission():
     #Output = Redirects to Home page on successful 
     # creation of the Show
 
+    from forms import ShowForm
     error = False
     try:
         form = ShowForm(request.form)
-        artist_id = form.artist_id.data
-        venue_id = form.venue_id.data
-        start_time = form.start_time.data
-        venue = Venue.query.get(venue_id)
-        artist = Artist.query.get(artist_id)
-        venue.artists.append(artist)
-        db.session.merge(venue)
-        db.session.commit()
-        statement = (
-            Show.update()
-            .where(Show.c.artist_id == artist_id, Show.c.venue_id == venue_id)
-            .values(start_time=start_time)
+        show = Show(
+            artist_id=form.artist_id.data,
+            venue_id=form.venue_id.data,
+            start_time=form.start_time.data,
         )
-        db.session.execute(statement)
+        db.session.add(show)
+        db.session.flush()
+        now = datetime.now(timezone.utc)
+        touch(Venue, [form.venue_id.data], now)
+        touch(Artist, [form.artist_id.data], now)
+        update_show_stats(Venue, [form.venue_id.data], now)
+        update_show_stats(Artist, [form.artist_id.data], now)
         db.session.commit()
+        get_cache().delete(venue_key(form.venue_id.data), artist_key(form.artist_id.data))
+        home_feed().changed()
     except:
         db.session.rollback()
         error = True
@@ -529,41 +844,263 @@ def create_show_submission():
         flash("An error occurred. Show could not be listed.")
     else:
         flash("Show was successfully listed!")
-    return render_template("pages/home.html")
+    return render_home()
     # called to create new shows in the db, upon submitting new show listing form
 
 
-@app.errorhandler(404)
+# ----------------------------------------------------------------------------#
+#  API
+#  ----------------------------------------------------------------
+#  Versioned JSON views of the pages above, built from the same cached
+#  response records. Every response carries an ETag for conditional GETs
+
+@views.route("/api/v1/venues")
+def api_venues():
+    #Output = Venues grouped by City and State
+    count, updated_at = listing_version(Venue)
+    return conditional(
+        entity_tag("api", "venues", count, updated_at),
+        None,
+        lambda: json_response({"areas": venue_areas()}, etag=False),
+    )
+
+
+@views.route("/api/v1/venues/<int:venue_id>")
+def api_venue(venue_id):
+    #Output = Details of a venue with Past and Upcoming shows
+    version = page_version(Venue, Show.venue_id, venue_id, datetime.now(timezone.utc))
+    if version is None:
+        return api_error(404, "venue not found")
+    etag, last_modified = version
+    return conditional(
+        entity_tag("api", etag),
+        last_modified,
+        lambda: json_response(
+            cached(get_cache(), venue_key(venue_id), lambda: venue_response(venue_id), etag), etag=False
+        ),
+    )
+
+
+@views.route("/api/v1/venues/search")
+def api_search_venues():
+    #Input = q search term and optional page number
+    return api_search(Venue)
+
+
+@views.route("/api/v1/venues/browse")
+def api_browse_venues():
+    #Input = optional state, genre, seeking (seeking talent, 1 or 0) and page
+    return api_browse(Venue)
+
+
+@views.route("/api/v1/artists")
+def api_artists():
+    #Output = id and name of every Artist
+    count, updated_at = listing_version(Artist)
+    return conditional(
+        entity_tag("api", "artists", count, updated_at),
+        updated_at,
+        lambda: json_response(
+            {"artists": db.session.query(*profile_columns(Artist, "listing")).order_by(Artist.id).all()},
+            etag=False,
+        ),
+    )
+
+
+@views.route("/api/v1/artists/<int:artist_id>")
+def api_artist(artist_id):
+    #Output = Details of an artist with Past and Upcoming shows
+    version = page_version(Artist, Show.artist_id, artist_id, datetime.now(timezone.utc))
+    if version is None:
+        return api_error(404, "artist not found")
+    etag, last_modified = version
+    return conditional(
+        entity_tag("api", etag),
+        last_modified,
+        lambda: json_response(
+            cached(get_cache(), artist_key(artist_id), lambda: artist_response(artist_id), etag), etag=False
+        ),
+    )
+
+
+@views.route("/api/v1/artists/search")
+def api_search_artists():
+    #Input = q search term and optional page number
+    return api_search(Artist)
+
+
+def api_search(model):
+    #Search results only change with the venues or artists searched
+    term = request.args.get("q")
+    page = request.args.get("page", 1, type=int)
+
+    def render():
+        response = search(model, term, current_app.config["SEARCH_RESULTS_LIMIT"], page=page)
+        return json_response({
+            "count": response.count,
+            "page": response.page,
+            "per_page": response.per_page,
+            "has_next": response.has_next,
+            "data": response.data,
+        }, etag=False)
+
+    count, updated_at = listing_version(model)
+    return conditional(
+        entity_tag("api", "search", model.__tablename__, count, updated_at, term, page), None, render
+    )
+
+
+@views.route("/api/v1/artists/browse")
+def api_browse_artists():
+    #Input = optional state, genre, seeking (seeking a venue, 1 or 0) and page
+    return api_browse(Artist)
+
+
+def api_browse(model):
+    #Output = One page of the matching venues or artists with the number of
+    # matches per genre and per state, e.g. ?state=CA&genre=Jazz
+    state = request.args.get("state")
+    genre = request.args.get("genre")
+    seeking = request.args.get("seeking")
+    if seeking not in (None, "0", "1"):
+        return api_error(400, "seeking must be 0 or 1")
+    seeking = None if seeking is None else seeking == "1"
+    page = request.args.get("page", 1, type=int)
+
+    def render():
+        try:
+            response = browse(
+                model, current_app.config["SEARCH_RESULTS_LIMIT"], page=page,
+                state=state, genre=genre, seeking=seeking,
+            )
+        except ValueError:
+            return api_error(400, "unknown genre")
+        return json_response({
+            "count": response.count,
+            "facets": {"genre": response.genres, "state": response.states},
+            "page": response.page,
+            "per_page": response.per_page,
+            "has_next": response.has_next,
+            "data": response.data,
+        }, etag=False)
+
+    count, updated_at = listing_version(model)
+    return conditional(
+        entity_tag("api", "browse", model.__tablename__, count, updated_at, state, genre, seeking, page),
+        None,
+        render,
+    )
+
+
+@views.route("/api/v1/shows")
+def api_shows():
+    #Input = optional cursor of the next page
+    #Output = One page of shows ordered by start time and the cursor of the next
+    try:
+        page = keyset_page(
+            db.session.query(
+                Show.venue_id,
+                Venue.name.label("venue_name"),
+                Show.artist_id,
+                Artist.name.label("artist_name"),
+                Artist.image_link.label("artist_image_link"),
+                Show.start_time,
+                Venue.updated_at.label("venue_updated_at"),
+                Artist.updated_at.label("artist_updated_at"),
+                Show.id,
+            )
+            .join(Venue, Show.venue_id == Venue.id)
+            .join(Artist, Show.artist_id == Artist.id),
+            (Show.start_time, Show.id),
+            cursor=request.args.get("cursor"),
+            per_page=current_app.config["SHOWS_PER_PAGE"],
+            wrap=lambda show: Shows(*show[:8]),
+        )
+    except ValueError:
+        return api_error(400, "invalid cursor")
+    shows = list(page)
+    return json_response({"shows": shows, "next_cursor": page.next_cursor})
+
+# ----------------------------------------------------------------------------#
+#  Export
+#  ----------------------------------------------------------------
+
+@views.route("/export/<entity>.<format>")
+def export_entity(entity, format):
+    #This endpoint streams venues or artists with their shows, or all shows,
+    # as JSON Lines or CSV, gzip compressed when the client accepts it
+    #Input = entity (venues, artists or shows) and format (jsonl or csv)
+    if not current_app.config["INTERNAL_ENDPOINTS"]:
+        abort(404)
+    if entity not in ("venues", "artists", "shows") or format not in EXPORT_FORMATS:
+        abort(404)
+    compress = "gzip" in request.accept_encodings
+    response = Response(
+        stream_with_context(export(entity, format, compress)),
+        mimetype="application/x-ndjson" if format == "jsonl" else "text/csv",
+    )
+    response.headers["Content-Disposition"] = "attachment; filename={}.{}".format(entity, format)
+    response.headers["Vary"] = "Accept-Encoding"
+    if compress:
+        response.headers["Content-Encoding"] = "gzip"
+    return response
+
+# ----------------------------------------------------------------------------#
+#  Internal
+#  ----------------------------------------------------------------
+
+@views.route("/internal/fragments")
+def fragment_stats():
+    #This endpoint reports the hits and misses of this worker's template
+    # fragment cache
+    if not current_app.config["INTERNAL_ENDPOINTS"]:
+        abort(404)
+    return jsonify(current_app.jinja_env.fragment_stats.snapshot(current_app.jinja_env.fragment_cache))
+
+
+@views.route("/internal/pool")
+def pool_stats():
+    #This endpoint reports the live state and counters of this worker's
+    # DB connection pool, to size workers against max_connections
+    if not current_app.config["INTERNAL_ENDPOINTS"]:
+        abort(404)
+    return jsonify(dbpool.stats.snapshot(db.get_engine(current_app).pool))
+
+
+@views.route("/internal/jobs")
+def job_stats():
+    #This endpoint reports the queue depth and the job counters and
+    # latencies of this worker
+    if not current_app.config["INTERNAL_ENDPOINTS"]:
+        abort(404)
+    return jsonify(current_app.extensions["jobs"].snapshot())
+
+
+@views.app_errorhandler(404)
 def not_found_error(error):
+    if request.path.startswith("/api/"):
+        return api_error(404, "not found")
     return render_template("errors/404.html"), 404
 
 
-@app.errorhandler(500)
+@views.app_errorhandler(500)
 def server_error(error):
+    if request.path.startswith("/api/"):
+        return api_error(500, "server error")
     return render_template("errors/500.html"), 500
 
 
-if not app.debug:
-    file_handler = FileHandler("error.log")
-    file_handler.setFormatter(
-        Formatter("%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]")
-    )
-    app.logger.setLevel(logging.INFO)
-    file_handler.setLevel(logging.INFO)
-    app.logger.addHandler(file_handler)
-    app.logger.info("errors")
-
 # ----------------------------------------------------------------------------#
 # Launch.
 # ----------------------------------------------------------------------------#
 
 # Default port:
 if __name__ == "__main__":
-    app.run()
+    create_app().run()
 
 # Or specify port manually:
 """
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5000))
-    app.run(host='0.0.0.0', port=port)
+    create_app().run(host='0.0.0.0', port=port)
 """
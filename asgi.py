@@ -0,0 +1,447 @@
+#----------------------------------------------------------------------------#
+# Async (ASGI) serving mode.
+#
+# The read routes (venues, artists, shows, search and the detail pages) are
+# served by async handlers on SQLAlchemy's asyncio extension and asyncpg, so
+# a worker keeps serving other requests while it waits on PostgreSQL. Every
+# other request (forms, JSON API, exports) goes to the Flask app of app.py.
+#
+#   pip install -r requirements.txt   (quart, asyncpg, asgiref and uvicorn)
+#   uvicorn asgi:application --workers 4
+#
+# The sync mode (python app.py or any WSGI server on wsgi:app) is unchanged.
+#----------------------------------------------------------------------------#
+
+import asyncio
+import time
+from datetime import datetime, timezone
+from itertools import groupby
+from operator import attrgetter
+
+from asgiref.wsgi import WsgiToAsgi
+from quart import Quart, abort, make_response, render_template, request
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import create_async_engine
+from werkzeug.exceptions import HTTPException
+
+from app import listing_version_statement, page_version_statement, version_of
+from cache import artist_key, call_async, venue_key
+from conditional import entity_tag, is_fresh, set_validators
+from filters import format_datetime
+from fragments import FragmentCacheExtension
+from model import (
+    Area,
+    Artist,
+    ArtistResponse,
+    ArtistShowResponse,
+    SearchResponse,
+    SearchResult,
+    Show,
+    Shows,
+    Venue,
+    VenueResponse,
+    VenueShowResponse,
+    VenueStats,
+    profile_columns,
+)
+from pagination import ARTIST_SORTS, KeysetPage, artist_directory, keyset_query, row_key
+from search import count_statement, result_count, search_statement
+from wsgi import app as flask_app
+
+# ----------------------------------------------------------------------------#
+# App Config.
+# ----------------------------------------------------------------------------#
+
+async_app = Quart(__name__)
+async_app.config.from_object("config")
+async_app.jinja_env.filters["datetime"] = format_datetime
+async_app.jinja_env.add_extension(FragmentCacheExtension)
+# Both modes render the same fragments, so they share one fragment cache
+async_app.jinja_env.fragment_cache = flask_app.jinja_env.fragment_cache
+async_app.jinja_env.fragment_stats = flask_app.jinja_env.fragment_stats
+cache = flask_app.extensions["cache"]
+
+engine = None
+
+
+def async_database_url(config):
+    #Output = ASYNC_DATABASE_URL, or SQLALCHEMY_DATABASE_URI on asyncpg
+    if config["ASYNC_DATABASE_URL"]:
+        return config["ASYNC_DATABASE_URL"]
+    url = config["SQLALCHEMY_DATABASE_URI"]
+    for prefix in ("postgresql+psycopg2://", "postgresql://", "postgres://"):
+        if url.startswith(prefix):
+            return "postgresql+asyncpg://" + url[len(prefix):]
+    return url
+
+
+@async_app.before_serving
+async def create_engine():
+    #The pool is sized by the same DB_POOL_* settings as the sync engine
+    global engine
+    options = {
+        key: value
+        for key, value in async_app.config["SQLALCHEMY_ENGINE_OPTIONS"].items()
+        if key != "poolclass"
+    }
+    engine = create_async_engine(async_database_url(async_app.config), **options)
+
+
+@async_app.after_serving
+async def dispose_engine():
+    await engine.dispose()
+
+# ----------------------------------------------------------------------------#
+# Queries.
+# ----------------------------------------------------------------------------#
+
+
+async def venue_areas(conn):
+    #Same single ordered query as the sync venue_areas
+    result = await conn.execute(
+        select(
+            *profile_columns(Venue, "listing"),
+            func.coalesce(VenueStats.upcoming_shows_count, 0).label("upcoming_shows_count"),
+        )
+        .outerjoin(VenueStats, VenueStats.id == Venue.id)
+        .order_by(Venue.state, Venue.city, Venue.id)
+    )
+    return [
+        Area(city=city, state=state, venues=list(group))
+        for (city, state), group in groupby(result, key=attrgetter("city", "state"))
+    ]
+
+
+async def venue_response(conn, venue_id):
+    #Output = VenueResponse, or None when the venue does not exist
+    data = (await conn.execute(select(*profile_columns(Venue, "detail")).where(Venue.id == venue_id))).first()
+    if data is None:
+        return None
+    now = datetime.now(timezone.utc)
+    shows = (
+        select(*profile_columns(Artist, "tile"), Show.start_time)
+        .join(Show, Show.artist_id == Artist.id)
+        .where(Show.venue_id == venue_id)
+    )
+    past = await conn.execute(shows.where(Show.start_time <= now).order_by(Show.start_time.desc()))
+    past_shows = [
+        VenueShowResponse(show.image_link, show.id, show.name, show.start_time, show.updated_at)
+        for show in past
+    ]
+    upcoming = await conn.execute(shows.where(Show.start_time > now).order_by(Show.start_time))
+    upcoming_shows = [
+        VenueShowResponse(show.image_link, show.id, show.name, show.start_time, show.updated_at)
+        for show in upcoming
+    ]
+
+    return VenueResponse(
+        id=data.id,
+        name=data.name,
+        city=data.city,
+        state=data.state,
+        address=data.address,
+        phone=data.phone,
+        genres=data.genres,
+        image_link=data.image_link,
+        facebook_link=data.facebook_link,
+        website=data.website_link,
+        seeking_talent=data.seeking_talent,
+        seeking_description=data.seeking_description,
+        upcoming_shows_count=len(upcoming_shows),
+        upcoming_shows=upcoming_shows,
+        past_shows_count=len(past_shows),
+        past_shows=past_shows,
+    )
+
+
+async def artist_response(conn, artist_id):
+    #Output = ArtistResponse, or None when the artist does not exist
+    data = (await conn.execute(select(*profile_columns(Artist, "detail")).where(Artist.id == artist_id))).first()
+    if data is None:
+        return None
+    now = datetime.now(timezone.utc)
+    shows = (
+        select(*profile_columns(Venue, "tile"), Show.start_time)
+        .join(Show, Show.venue_id == Venue.id)
+        .where(Show.artist_id == artist_id)
+    )
+    past = await conn.execute(shows.where(Show.start_time <= now).order_by(Show.start_time.desc()))
+    past_shows = [
+        ArtistShowResponse(show.image_link, show.id, show.name, show.start_time, show.updated_at)
+        for show in past
+    ]
+    upcoming = await conn.execute(shows.where(Show.start_time > now).order_by(Show.start_time))
+    upcoming_shows = [
+        ArtistShowResponse(show.image_link, show.id, show.name, show.start_time, show.updated_at)
+        for show in upcoming
+    ]
+
+    return ArtistResponse(
+        id=data.id,
+        name=data.name,
+        city=data.city,
+        state=data.state,
+        phone=data.phone,
+        genres=data.genres,
+        image_link=data.image_link,
+        facebook_link=data.facebook_link,
+        website=data.website_link,
+        seeking_venue=data.seeking_venue,
+        seeking_description=data.seeking_description,
+        upcoming_shows_count=len(upcoming_shows),
+        upcoming_shows=upcoming_shows,
+        past_shows_count=len(past_shows),
+        past_shows=past_shows,
+    )
+
+
+async def cached_response(key, load, version):
+    #Reads through the detail cache shared with the sync routes, so their
+    # invalidations on edits apply here too. Entries are versioned like in
+    # cache.cached()
+    entry = await call_async(cache, "get", key)
+    if entry is not None and entry[0] == version:
+        return entry[1]
+    async with engine.connect() as conn:
+        value = await load(conn)
+    await call_async(cache, "set", key, (version, value))
+    return value
+
+
+async def page_version(model, key_column, key):
+    #The page_version of app.py on the async engine
+    async with engine.connect() as conn:
+        row = (await conn.execute(
+            page_version_statement(model, key_column, key, datetime.now(timezone.utc))
+        )).first()
+    return version_of(model, key, row)
+
+
+async def listing_version(model):
+    #The listing_version of app.py on the async engine
+    async with engine.connect() as conn:
+        return (await conn.execute(listing_version_statement(model))).one()
+
+
+async def conditional(etag, last_modified, render, weak=True):
+    #The conditional() of conditional.py for the async routes, with an async
+    # render, so both serving modes send the same validators and 304s
+    if is_fresh(etag, last_modified, request):
+        response = async_app.response_class("", status=304)
+    else:
+        response = await make_response(await render())
+        if response.status_code != 200:
+            return response
+    return set_validators(response, etag, last_modified, weak)
+
+
+async def search(model, term, per_page, page):
+    #The PostgreSQL search of search.py on the async engine
+    term = (term or "").strip()
+    page = max(page, 1)
+    start = time.perf_counter()
+    async with engine.connect() as conn:
+        result = await conn.execute(
+            search_statement(model, term, per_page, (page - 1) * per_page, paginated=True)
+        )
+        data = result.all()
+        count = result_count(data, True)
+        if count is None:
+            count = (await conn.execute(count_statement(model, term))).scalar()
+    return SearchResponse(
+        count=count,
+        data=[SearchResult(row.id, row.name) for row in data],
+        page=page,
+        per_page=per_page,
+        elapsed=time.perf_counter() - start,
+    )
+
+# ----------------------------------------------------------------------------#
+# Controllers.
+# ----------------------------------------------------------------------------#
+
+
+def build_home_feed():
+    #Output = the home feed snapshot, built in a Flask app context when this
+    # process has none yet
+    with flask_app.app_context():
+        return flask_app.extensions["feed"].get()
+
+
+@async_app.route("/")
+async def index():
+    feed = flask_app.extensions["feed"]
+    # Only the first request of a process builds the snapshot, off the loop
+    snapshot = feed.snapshot or await asyncio.to_thread(build_home_feed)
+    feed.ensure_started()
+    return await render_template(
+        "pages/home.html",
+        upcoming_shows=snapshot.upcoming(datetime.now(timezone.utc)),
+        recent_venues=snapshot.venues,
+        recent_artists=snapshot.artists,
+    )
+
+
+@async_app.route("/venues")
+async def venues():
+    count, updated_at = await listing_version(Venue)
+
+    async def render():
+        async with engine.connect() as conn:
+            areas = await venue_areas(conn)
+        return await render_template("pages/venues.html", areas=areas)
+
+    return await conditional(entity_tag("venues", count, updated_at), None, render)
+
+
+@async_app.route("/venues/search", methods=["POST"])
+async def search_venues():
+    form = await request.form
+    response = await search(
+        Venue, form.get("search_term"), async_app.config["SEARCH_RESULTS_LIMIT"],
+        form.get("page", 1, type=int),
+    )
+    return await render_template(
+        "pages/search_venues.html", results=response, search_term=form.get("search_term", "")
+    )
+
+
+@async_app.route("/venues/<int:venue_id>")
+async def show_venue(venue_id):
+    version = await page_version(Venue, Show.venue_id, venue_id)
+    if version is None:
+        abort(404)
+    etag, last_modified = version
+
+    async def render():
+        response = await cached_response(venue_key(venue_id), lambda conn: venue_response(conn, venue_id), etag)
+        if response is None:
+            abort(404)
+        return await render_template("pages/show_venue.html", venue=response)
+
+    return await conditional(etag, last_modified, render)
+
+
+@async_app.route("/artists")
+async def artists():
+    sort = request.args.get("sort", "name")
+    cursor = request.args.get("cursor")
+    per_page = async_app.config["ARTISTS_PER_PAGE"]
+    try:
+        statement, columns = artist_directory(sort, cursor, per_page)
+    except ValueError:
+        abort(400)
+    count, updated_at = await listing_version(Artist)
+
+    async def render():
+        async with engine.connect() as conn:
+            rows = (await conn.execute(statement)).all()
+        return await render_template(
+            "pages/artists.html",
+            artists=KeysetPage(rows, per_page, key=row_key(columns)),
+            sort=sort,
+            sorts=ARTIST_SORTS,
+        )
+
+    return await conditional(entity_tag("artists", sort, cursor, count, updated_at), updated_at, render)
+
+
+@async_app.route("/artists/search", methods=["POST"])
+async def search_artists():
+    form = await request.form
+    response = await search(
+        Artist, form.get("search_term"), async_app.config["SEARCH_RESULTS_LIMIT"],
+        form.get("page", 1, type=int),
+    )
+    return await render_template(
+        "pages/search_artists.html", results=response, search_term=form.get("search_term", "")
+    )
+
+
+@async_app.route("/artists/<int:artist_id>")
+async def show_artist(artist_id):
+    version = await page_version(Artist, Show.artist_id, artist_id)
+    if version is None:
+        abort(404)
+    etag, last_modified = version
+
+    async def render():
+        response = await cached_response(
+            artist_key(artist_id), lambda conn: artist_response(conn, artist_id), etag
+        )
+        if response is None:
+            abort(404)
+        return await render_template("pages/show_artist.html", artist=response)
+
+    return await conditional(etag, last_modified, render)
+
+
+@async_app.route("/shows")
+async def shows():
+    columns = (Show.start_time, Show.id)
+    try:
+        statement = keyset_query(
+            select(
+                Show.venue_id,
+                Venue.name.label("venue_name"),
+                Show.artist_id,
+                Artist.name.label("artist_name"),
+                Artist.image_link,
+                Show.start_time,
+                Venue.updated_at.label("venue_updated_at"),
+                Artist.updated_at.label("artist_updated_at"),
+                Show.id,
+            )
+            .select_from(Show)
+            .join(Venue, Show.venue_id == Venue.id)
+            .join(Artist, Show.artist_id == Artist.id),
+            columns,
+            cursor=request.args.get("cursor"),
+            per_page=async_app.config["SHOWS_PER_PAGE"],
+        )
+    except ValueError:
+        abort(400)
+    async with engine.connect() as conn:
+        rows = (await conn.execute(statement)).all()
+    page = KeysetPage(
+        rows,
+        async_app.config["SHOWS_PER_PAGE"],
+        key=row_key(columns),
+        wrap=lambda show: Shows(*show[:8]),
+    )
+    return await render_template("pages/shows.html", shows=page)
+
+
+@async_app.errorhandler(404)
+async def not_found_error(error):
+    return await render_template("errors/404.html"), 404
+
+
+@async_app.errorhandler(500)
+async def server_error(error):
+    return await render_template("errors/500.html"), 500
+
+# ----------------------------------------------------------------------------#
+# Dispatch.
+# ----------------------------------------------------------------------------#
+
+sync_application = WsgiToAsgi(flask_app)
+async_routes = async_app.url_map.bind("localhost")
+
+
+def serves(method, path):
+    #Output = True when the async app has a route for this request
+    try:
+        async_routes.match(path, method=method)
+    except HTTPException:
+        return False
+    return True
+
+
+async def application(scope, receive, send):
+    #ASGI entry point: read routes go to the async app, every other request
+    # to the Flask app, which asgiref runs in a thread pool
+    if scope["type"] == "http" and not serves(scope["method"], scope["path"]):
+        await sync_application(scope, receive, send)
+    else:
+        await async_app(scope, receive, send)
@@ -0,0 +1,190 @@
+#----------------------------------------------------------------------------#
+# Throughput of the sync (WSGI) and async (ASGI) serving modes under load.
+#
+# Starts the app in each mode as a real server, drives the read routes with
+# an increasing number of concurrent clients and writes requests/s and
+# p50/p95/p99 latency per mode and concurrency as JSON. Seed the database
+# first, e.g. with bench_routes.py:
+#
+#   python benchmarks/bench_routes.py --database-url postgresql://localhost/fyyur_bench \
+#       --venues 10000 --artists 10000 --shows 100000 --routes index
+#   python benchmarks/bench_async.py --database-url postgresql://localhost/fyyur_bench \
+#       --venues 10000 --artists 10000 --concurrency 1 8 32 128 --output bench_async.json
+#
+# Needs gunicorn for the sync mode and quart, asyncpg, asgiref and uvicorn
+# for the async mode, all listed in requirements.txt.
+#----------------------------------------------------------------------------#
+
+import argparse
+import http.client
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from urllib.parse import urlencode
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+WORDS = ['blue', 'red', 'golden', 'electric', 'velvet', 'jazz', 'ca', 'ny']
+
+MODES = {
+    'sync': lambda args, port: [
+        sys.executable, '-m', 'gunicorn', 'wsgi:app', '--bind', '127.0.0.1:{}'.format(port),
+        '--workers', str(args.workers), '--threads', str(args.threads), '--worker-class', 'gthread',
+    ],
+    'async': lambda args, port: [
+        sys.executable, '-m', 'uvicorn', 'asgi:application', '--host', '127.0.0.1',
+        '--port', str(port), '--workers', str(args.workers), '--no-access-log',
+    ],
+}
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Compare the sync and async serving modes under load')
+    parser.add_argument('--database-url', required=True, help='seeded PostgreSQL database')
+    parser.add_argument('--venues', type=int, default=1000, help='venues in the seeded database')
+    parser.add_argument('--artists', type=int, default=1000, help='artists in the seeded database')
+    parser.add_argument('--modes', nargs='*', default=list(MODES), choices=list(MODES))
+    parser.add_argument('--workers', type=int, default=2, help='server processes per mode')
+    parser.add_argument('--threads', type=int, default=8, help='threads per sync worker')
+    parser.add_argument('--concurrency', type=int, nargs='*', default=[1, 8, 32, 128],
+                        help='concurrent clients per run')
+    parser.add_argument('--duration', type=float, default=10, help='seconds per run')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', help='write the JSON report to this file instead of stdout')
+    return parser.parse_args()
+
+
+def requests(args, rng):
+    #Each request is (method, path, form body) on a read route
+    search = lambda path: ('POST', path, urlencode({'search_term': rng.choice(WORDS)}))
+    return [
+        lambda: ('GET', '/venues', None),
+        lambda: ('GET', '/venues/{}'.format(rng.randrange(args.venues) + 1), None),
+        lambda: ('GET', '/artists', None),
+        lambda: ('GET', '/artists/{}'.format(rng.randrange(args.artists) + 1), None),
+        lambda: ('GET', '/shows', None),
+        lambda: search('/venues/search'),
+        lambda: search('/artists/search'),
+    ]
+
+
+def start_server(mode, args):
+    env = dict(os.environ, DATABASE_URL=args.database_url, SLOW_REQUEST_MS='inf', SERVER_TIMING='0')
+    server = subprocess.Popen(
+        MODES[mode](args, args.port), cwd=ROOT, env=env,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError('{} server exited with {}'.format(mode, server.returncode))
+        try:
+            conn = http.client.HTTPConnection('127.0.0.1', args.port, timeout=1)
+            conn.request('GET', '/')
+            conn.getresponse().read()
+            return server
+        except OSError:
+            time.sleep(0.2)
+    server.terminate()
+    raise RuntimeError('{} server did not start'.format(mode))
+
+
+def client(args, seed, deadline, timings, errors, lock):
+    #One keep-alive connection issuing requests back to back until deadline
+    rng = random.Random(seed)
+    choices = requests(args, rng)
+    conn = http.client.HTTPConnection('127.0.0.1', args.port, timeout=30)
+    local_timings = []
+    local_errors = 0
+    while time.monotonic() < deadline:
+        method, path, body = rng.choice(choices)()
+        headers = {'Content-Type': 'application/x-www-form-urlencoded'} if body else {}
+        start = time.perf_counter()
+        try:
+            conn.request(method, path, body=body, headers=headers)
+            response = conn.getresponse()
+            response.read()
+            if response.status >= 500:
+                local_errors += 1
+        except (OSError, http.client.HTTPException):
+            local_errors += 1
+            conn.close()
+            conn = http.client.HTTPConnection('127.0.0.1', args.port, timeout=30)
+            continue
+        local_timings.append((time.perf_counter() - start) * 1000)
+    with lock:
+        timings.extend(local_timings)
+        errors[0] += local_errors
+
+
+def run(args, concurrency):
+    timings = []
+    errors = [0]
+    lock = threading.Lock()
+    deadline = time.monotonic() + args.duration
+    threads = [
+        threading.Thread(target=client, args=(args, args.seed * 1000 + i, deadline, timings, errors, lock))
+        for i in range(concurrency)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    quantiles = statistics.quantiles(timings, n=100, method='inclusive') if len(timings) > 1 else [0] * 99
+    return {
+        'requests': len(timings),
+        'errors': errors[0],
+        'requests_per_s': round(len(timings) / args.duration, 1),
+        'p50_ms': round(quantiles[49], 3),
+        'p95_ms': round(quantiles[94], 3),
+        'p99_ms': round(quantiles[98], 3),
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd=ROOT, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    args = parse_args()
+    results = {}
+    for mode in args.modes:
+        server = start_server(mode, args)
+        try:
+            # Warm up the pools, caches and fragment caches of every worker
+            run(argparse.Namespace(**dict(vars(args), duration=2)), max(args.concurrency))
+            results[mode] = {}
+            for concurrency in args.concurrency:
+                results[mode][concurrency] = result = run(args, concurrency)
+                print('{:<6} c={:<4} {:>9.1f} req/s  p50 {:>8.2f}ms  p99 {:>8.2f}ms  {} errors'.format(
+                    mode, concurrency, result['requests_per_s'], result['p50_ms'], result['p99_ms'],
+                    result['errors']), file=sys.stderr)
+        finally:
+            server.terminate()
+            server.wait()
+
+    report = {
+        'commit': git_commit(),
+        'workers': args.workers,
+        'threads': args.threads,
+        'duration_s': args.duration,
+        'modes': results,
+    }
+    output = json.dumps(report, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
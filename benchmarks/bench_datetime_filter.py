@@ -0,0 +1,69 @@
+#----------------------------------------------------------------------------#
+# Benchmark of the `datetime` Jinja filter.
+#
+# Compares the original dateutil + babel filter with filters.format_datetime
+# on N timestamps in the stored '%Y-%m-%d %H:%M:%S' format:
+#
+#   python benchmarks/bench_datetime_filter.py -n 100000
+#----------------------------------------------------------------------------#
+
+import argparse
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+import babel.dates
+import dateutil.parser
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from filters import format_datetime
+
+
+def format_datetime_original(value, format="medium"):
+    date = dateutil.parser.parse(value)
+    if format == "full":
+        format = "EEEE MMMM, d, y 'at' h:mma"
+    elif format == "medium":
+        format = "EE MM, dd, y h:mma"
+    return babel.dates.format_datetime(date, format, locale="en")
+
+
+def timestamps(count, distinct):
+    start = datetime(2019, 1, 1, 20, 0, 0)
+    return [
+        (start + timedelta(hours=i % distinct)).strftime("%Y-%m-%d %H:%M:%S")
+        for i in range(count)
+    ]
+
+
+def run(name, function, values):
+    start = time.perf_counter()
+    for value in values:
+        function(value, "full")
+    elapsed = time.perf_counter() - start
+    print("{:<28} {:>9.3f}s {:>10.2f}us/call".format(name, elapsed, elapsed / len(values) * 1e6))
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the datetime Jinja filter")
+    parser.add_argument("-n", type=int, default=100000, help="number of timestamps")
+    parser.add_argument("--distinct", type=int, default=2000,
+                        help="number of distinct timestamps (shows repeat on listing pages)")
+    args = parser.parse_args()
+
+    unique = timestamps(args.n, args.n)
+    repeated = timestamps(args.n, args.distinct)
+
+    original = run("original", format_datetime_original, unique)
+    format_datetime.cache_clear()
+    fast = run("fast path, all distinct", format_datetime, unique)
+    format_datetime.cache_clear()
+    cached = run("fast path, %d distinct" % args.distinct, format_datetime, repeated)
+    print("speedup: {:.1f}x distinct, {:.1f}x repeated".format(original / fast, original / cached))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+#----------------------------------------------------------------------------#
+# Benchmark of the load profiles of model.py.
+#
+# Seeds venues and artists like bench_routes.py, then loads them as model
+# objects with every column (what Venue.query used to load) and with each
+# load profile, and writes the median load time and the mean row payload
+# (the text length of the loaded values) per profile as JSON:
+#
+#   python benchmarks/bench_profiles.py --venues 20000 --artists 20000
+#   python benchmarks/bench_profiles.py --database-url postgresql://localhost/fyyur_bench \
+#       --skip-seed --rows 50000
+#
+# The database is dropped and recreated unless --skip-seed is given, never
+# point it at real data.
+#----------------------------------------------------------------------------#
+
+import argparse
+import json
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+from bench_routes import git_commit, seed
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Benchmark the load profiles on a synthetic dataset')
+    parser.add_argument('--database-url', default=None,
+                        help='database to seed (default: a temporary SQLite file)')
+    parser.add_argument('--venues', type=int, default=10000)
+    parser.add_argument('--artists', type=int, default=10000)
+    parser.add_argument('--rows', type=int, default=None, help='rows loaded per run (default: all)')
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--skip-seed', action='store_true', help='reuse an already seeded database')
+    parser.add_argument('--output', help='write the JSON report to this file instead of stdout')
+    return parser.parse_args()
+
+
+def payload(rows):
+    #Output = mean text length in bytes of the non-null values of rows
+    total = sum(len(str(value).encode()) for row in rows for value in row if value is not None)
+    return round(total / len(rows), 1) if rows else 0.0
+
+
+def measure(db, query, runs):
+    #Output = (median ms to load query as objects, objects of the last run)
+    timings = []
+    for _ in range(runs):
+        # A fresh session each run, so objects are hydrated, not taken from
+        # the identity map
+        db.session.remove()
+        start = time.perf_counter()
+        objects = query().all()
+        timings.append((time.perf_counter() - start) * 1000)
+    return round(statistics.median(timings), 3), objects
+
+
+def main():
+    args = parse_args()
+    database_url = args.database_url or 'sqlite:///' + os.path.join(tempfile.gettempdir(), 'fyyur_bench.db')
+    # config.py reads the database url when the app is created
+    os.environ['DATABASE_URL'] = database_url
+    os.environ.setdefault('JOBS_BACKEND', 'inline')
+
+    import app as fyyur
+    from model import LOAD_PROFILES, load_profile
+
+    app, db = fyyur.create_app(), fyyur.db
+    app.config.update(SLOW_REQUEST_MS=float('inf'))
+    app.logger.setLevel(logging.WARNING)
+    if database_url.startswith('sqlite'):
+        # SQLite has no ARRAY type, store genres as JSON
+        for model in (fyyur.Venue, fyyur.Artist):
+            model.__table__.c.genres.type = db.JSON()
+
+    results = {}
+    with app.app_context():
+        if not args.skip_seed:
+            seed(db, fyyur.Venue, fyyur.Artist, fyyur.Show, argparse.Namespace(
+                venues=args.venues, artists=args.artists, shows=0, cities=100, seed=args.seed))
+
+        for model in (fyyur.Venue, fyyur.Artist):
+            base = lambda: model.query.order_by(model.id).limit(args.rows)
+            every = [column.key for column in model.__table__.columns]
+            profiles = {'full': (db.undefer_group('detail'), every)}
+            profiles.update(
+                (profile, (load_profile(model, profile), names))
+                for profile, names in LOAD_PROFILES[model].items()
+            )
+            results[model.__tablename__] = {}
+            for profile, (option, names) in profiles.items():
+                median_ms, objects = measure(db, lambda: base().options(option), args.runs)
+                columns = [getattr(model, name) for name in names]
+                rows = db.session.query(*columns).order_by(model.id).limit(args.rows).all()
+                results[model.__tablename__][profile] = result = {
+                    'columns': len(names),
+                    'rows': len(objects),
+                    'load_ms': median_ms,
+                    'row_bytes': payload(rows),
+                }
+                print('{:<7} {:<10} {:>3} columns  {:>9.2f}ms  {:>7.1f} bytes/row'.format(
+                    model.__tablename__, profile, result['columns'], result['load_ms'],
+                    result['row_bytes']), file=sys.stderr)
+
+    report = {
+        'commit': git_commit(),
+        'database': database_url.split(':', 1)[0],
+        'dataset': {'venues': args.venues, 'artists': args.artists, 'seed': args.seed},
+        'runs': args.runs,
+        'models': results,
+    }
+    output = json.dumps(report, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,239 @@
+#----------------------------------------------------------------------------#
+# Benchmark of every route of app.py on a seeded synthetic dataset.
+#
+# Seeds venues, artists and shows into a local PostgreSQL or SQLite database,
+# drives each route through Flask's test client and writes p50/p95/p99
+# latency and queries per request of each route, and the peak RSS of the whole
+# run, as JSON to compare commits:
+#
+#   python benchmarks/bench_routes.py --venues 1000 --artists 1000 --shows 10000
+#   python benchmarks/bench_routes.py --database-url postgresql://localhost/fyyur_bench \
+#       --venues 100000 --artists 100000 --shows 1000000 --output bench_output.json
+#
+# The database is dropped and recreated, never point it at real data.
+#----------------------------------------------------------------------------#
+
+import argparse
+import json
+import logging
+import os
+import random
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+GENRES = ['Jazz', 'Rock_n_Roll', 'Blues', 'Folk', 'Classical', 'Hip_Hop', 'Pop', 'Soul']
+STATES = ['CA', 'NY', 'TX', 'WA', 'IL', 'FL', 'MA', 'CO']
+WORDS = ['Blue', 'Red', 'Golden', 'Electric', 'Velvet', 'Silent', 'Wild', 'Lucky',
+         'Moon', 'River', 'Garden', 'Echo', 'Palace', 'Lounge', 'Hall', 'Club']
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Benchmark the Fyyur routes on a synthetic dataset')
+    parser.add_argument('--database-url', default=None,
+                        help='database to seed (default: a temporary SQLite file)')
+    parser.add_argument('--venues', type=int, default=1000)
+    parser.add_argument('--artists', type=int, default=1000)
+    parser.add_argument('--shows', type=int, default=10000)
+    parser.add_argument('--cities', type=int, default=100, help='number of distinct cities')
+    parser.add_argument('--requests', type=int, default=200, help='requests per route')
+    parser.add_argument('--routes', nargs='*', help='only run the named routes')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--skip-seed', action='store_true', help='reuse an already seeded database')
+    parser.add_argument('--output', help='write the JSON report to this file instead of stdout')
+    return parser.parse_args()
+
+
+def name(rng):
+    return '{} {} {}'.format(rng.choice(WORDS), rng.choice(WORDS), rng.randrange(100000))
+
+
+def seed(db, Venue, Artist, Show, args, chunk_size=10000):
+    #Bulk inserts the dataset in chunks with executemany, then fills the show
+    # stats tables the listings read, like after a bulk import
+    from stats import rebuild_show_stats
+
+    rng = random.Random(args.seed)
+    cities = ['City {}'.format(i) for i in range(args.cities)]
+    postgresql = db.engine.dialect.name == 'postgresql'
+    if postgresql:
+        # The search indexes use gin_trgm_ops
+        db.session.execute(db.text('CREATE EXTENSION IF NOT EXISTS pg_trgm'))
+        db.session.commit()
+    db.drop_all()
+    db.create_all()
+
+    def insert(table, count, row):
+        for start in range(0, count, chunk_size):
+            rows = [row(i) for i in range(start, min(start + chunk_size, count))]
+            db.session.execute(table.insert(), rows)
+            db.session.commit()
+
+    insert(Venue.__table__, args.venues, lambda i: dict(
+        id=i + 1, name=name(rng), city=rng.choice(cities), state=rng.choice(STATES),
+        address='{} Main St'.format(i), phone='555-{:04d}'.format(i % 10000),
+        genres=rng.sample(GENRES, 2), image_link='https://example.com/venue/{}.jpg'.format(i),
+        facebook_link='https://facebook.com/venue{}'.format(i), website_link=None,
+        seeking_talent=rng.random() < 0.5, seeking_description='Looking for bands',
+    ))
+    insert(Artist.__table__, args.artists, lambda i: dict(
+        id=i + 1, name=name(rng), city=rng.choice(cities), state=rng.choice(STATES),
+        phone='555-{:04d}'.format(i % 10000), genres=rng.sample(GENRES, 2),
+        image_link='https://example.com/artist/{}.jpg'.format(i),
+        facebook_link='https://facebook.com/artist{}'.format(i), website_link=None,
+        seeking_venue=rng.random() < 0.5, seeking_description='Looking for venues',
+    ))
+    now = datetime.now(timezone.utc)
+    insert(Show.__table__, args.shows, lambda i: dict(
+        id=i + 1, venue_id=rng.randrange(args.venues) + 1, artist_id=rng.randrange(args.artists) + 1,
+        start_time=now + timedelta(minutes=rng.randrange(-2 * 525600, 2 * 525600)),
+    ))
+    rebuild_show_stats(now)
+    db.session.commit()
+    if postgresql:
+        for table in ('venue', 'artist', 'show'):
+            db.session.execute(
+                "SELECT setval(pg_get_serial_sequence('{0}', 'id'), (SELECT max(id) FROM {0}))".format(table)
+            )
+        db.session.execute('ANALYZE')
+        db.session.commit()
+
+
+def routes(args, rng):
+    #Each route is (name, method, url factory, form data factory)
+    venue = lambda: rng.randrange(args.venues) + 1
+    artist = lambda: rng.randrange(args.artists) + 1
+    term = lambda: {'search_term': rng.choice(WORDS).lower()}
+    venue_form = lambda: {
+        'name': name(rng), 'city': 'City 1', 'state': rng.choice(STATES), 'address': '1 Main St',
+        'genres': rng.sample(GENRES, 2), 'facebook_link': 'https://facebook.com/bench',
+    }
+    artist_form = lambda: {
+        'name': name(rng), 'city': 'City 1', 'state': rng.choice(STATES),
+        'genres': rng.sample(GENRES, 2), 'facebook_link': 'https://facebook.com/bench',
+    }
+    return [
+        ('index', 'GET', lambda: '/', None),
+        ('venues', 'GET', lambda: '/venues', None),
+        ('show_venue', 'GET', lambda: '/venues/{}'.format(venue()), None),
+        ('artists', 'GET', lambda: '/artists', None),
+        ('show_artist', 'GET', lambda: '/artists/{}'.format(artist()), None),
+        ('shows', 'GET', lambda: '/shows', None),
+        ('shows_stream', 'GET', lambda: '/shows?stream=1', None),
+        ('search_venues', 'POST', lambda: '/venues/search', term),
+        ('search_artists', 'POST', lambda: '/artists/search', term),
+        ('create_venue', 'POST', lambda: '/venues/create', venue_form),
+        ('create_artist', 'POST', lambda: '/artists/create', artist_form),
+        ('create_show', 'POST', lambda: '/shows/create', lambda: {
+            'venue_id': str(venue()), 'artist_id': str(artist()), 'start_time': '2030-01-01 20:00:00',
+        }),
+        ('edit_venue', 'POST', lambda: '/venues/{}/edit'.format(venue()), venue_form),
+        ('edit_artist', 'POST', lambda: '/artists/{}/edit'.format(artist()), artist_form),
+    ]
+
+
+def percentile(quantiles, p):
+    return round(quantiles[p - 1], 3)
+
+
+def peak_rss_mb():
+    #ru_maxrss only grows over the life of the process, so this is the peak of
+    # the whole run up to now and cannot be told apart per route
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd=ROOT, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    args = parse_args()
+    database_url = args.database_url or 'sqlite:///' + os.path.join(tempfile.gettempdir(), 'fyyur_bench.db')
+    # config.py reads the database url when the app is created
+    os.environ['DATABASE_URL'] = database_url
+
+    from sqlalchemy import event
+    from sqlalchemy.engine import Engine
+    import app as fyyur
+
+    app, db = fyyur.create_app(), fyyur.db
+    app.config.update(WTF_CSRF_ENABLED=False, SLOW_REQUEST_MS=float('inf'))
+    app.logger.setLevel(logging.WARNING)
+    if database_url.startswith('sqlite'):
+        # SQLite has no ARRAY type, store genres as JSON
+        for model in (fyyur.Venue, fyyur.Artist):
+            model.__table__.c.genres.type = db.JSON()
+
+    queries = [0]
+
+    @event.listens_for(Engine, 'after_cursor_execute')
+    def count_query(*args):
+        queries[0] += 1
+
+    with app.app_context():
+        seed_start = time.perf_counter()
+        if not args.skip_seed:
+            seed(db, fyyur.Venue, fyyur.Artist, fyyur.Show, args)
+        seed_seconds = time.perf_counter() - seed_start
+
+    rng = random.Random(args.seed)
+    client = app.test_client()
+    results = {}
+    for route, method, url, form in routes(args, rng):
+        if args.routes and route not in args.routes:
+            continue
+        timings = []
+        statuses = {}
+        queries[0] = 0
+        for _ in range(args.requests):
+            path = url()
+            data = form() if form else None
+            start = time.perf_counter()
+            response = client.open(path, method=method, data=data)
+            response.get_data()
+            timings.append((time.perf_counter() - start) * 1000)
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+        quantiles = statistics.quantiles(timings, n=100, method='inclusive')
+        results[route] = {
+            'method': method,
+            'requests': len(timings),
+            'status': statuses,
+            'mean_ms': round(statistics.mean(timings), 3),
+            'p50_ms': percentile(quantiles, 50),
+            'p95_ms': percentile(quantiles, 95),
+            'p99_ms': percentile(quantiles, 99),
+            'queries_per_request': round(queries[0] / len(timings), 2),
+        }
+        print('{:<16} p50 {:>9.2f}ms  p99 {:>9.2f}ms  {:>6.1f} queries'.format(
+            route, results[route]['p50_ms'], results[route]['p99_ms'],
+            results[route]['queries_per_request']), file=sys.stderr)
+
+    report = {
+        'commit': git_commit(),
+        'database': database_url.split(':', 1)[0],
+        'dataset': {'venues': args.venues, 'artists': args.artists, 'shows': args.shows,
+                    'cities': args.cities, 'seed': args.seed},
+        'seed_seconds': round(seed_seconds, 2),
+        'peak_rss_mb': round(peak_rss_mb(), 1),
+        'routes': results,
+    }
+    output = json.dumps(report, indent=2, sort_keys=True, default=str)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,126 @@
+#----------------------------------------------------------------------------#
+# Cold start benchmark: how long a fresh interpreter takes to build the app.
+#
+# Runs the target statement in new interpreters under python -X importtime
+# and reports the median wall time and the modules with the highest
+# cumulative import time. --baseline REV runs the same measurement on an
+# older commit, extracted with git archive, to compare:
+#
+#   python benchmarks/bench_startup.py
+#   python benchmarks/bench_startup.py --baseline HEAD~1 --baseline-target "import app"
+#
+# The app is never served and no database connection is opened.
+#----------------------------------------------------------------------------#
+
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tarfile
+import tempfile
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+IMPORTTIME = re.compile(r'import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)')
+
+# Imports worth watching: heavy, and not needed to serve most requests
+WATCHED = ['alembic', 'flask_migrate', 'babel', 'dateutil', 'wtforms', 'flask_wtf', 'forms']
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Measure the cold start time of the app')
+    parser.add_argument('--target', default='from wsgi import app',
+                        help='statement that builds the app')
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--top', type=int, default=15, help='modules listed by cumulative time')
+    parser.add_argument('--baseline', help='git revision to compare with')
+    parser.add_argument('--baseline-target', help='statement for the baseline (default: --target)')
+    parser.add_argument('--database-url', default='sqlite://',
+                        help='DATABASE_URL while importing (default: in-memory SQLite)')
+    parser.add_argument('--output', help='write the JSON report to this file instead of stdout')
+    return parser.parse_args()
+
+
+def run_once(cwd, target, database_url):
+    #Output = (wall ms of the target statement, {top level module: cumulative us})
+    code = (
+        'import time\n'
+        'started = time.perf_counter()\n'
+        '{}\n'
+        'print((time.perf_counter() - started) * 1000)\n'
+    ).format(target)
+    env = dict(os.environ, DATABASE_URL=database_url)
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-W', 'ignore', '-c', code],
+        cwd=cwd, env=env, capture_output=True, text=True, check=True,
+    )
+    modules = {}
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME.match(line)
+        if match:
+            _, cumulative, indent, name = match.groups()
+            modules[name] = max(modules.get(name, 0), int(cumulative))
+    return float(result.stdout.strip().splitlines()[-1]), modules
+
+
+def measure(cwd, target, args):
+    # The first run also fills the bytecode cache, so it is not counted
+    run_once(cwd, target, args.database_url)
+    walls = []
+    modules = {}
+    for _ in range(args.runs):
+        wall, run_modules = run_once(cwd, target, args.database_url)
+        walls.append(wall)
+        for name, cumulative in run_modules.items():
+            modules.setdefault(name, []).append(cumulative)
+    medians = {name: statistics.median(values) / 1000 for name, values in modules.items()}
+    top = sorted(medians.items(), key=lambda item: -item[1])[:args.top]
+    return {
+        'target': target,
+        'wall_ms': {
+            'median': round(statistics.median(walls), 1),
+            'min': round(min(walls), 1),
+            'max': round(max(walls), 1),
+        },
+        'modules_imported': len(medians),
+        'watched_imports_ms': {name: round(medians[name], 1) for name in WATCHED if name in medians},
+        'top_cumulative_ms': {name: round(ms, 1) for name, ms in top},
+    }
+
+
+def checkout(revision, directory):
+    archive = subprocess.run(['git', 'archive', revision], cwd=ROOT, capture_output=True, check=True)
+    with tempfile.TemporaryFile() as f:
+        f.write(archive.stdout)
+        f.seek(0)
+        with tarfile.open(fileobj=f) as tar:
+            tar.extractall(directory)
+
+
+def main():
+    args = parse_args()
+    report = {'python': sys.version.split()[0], 'runs': args.runs, 'current': measure(ROOT, args.target, args)}
+    if args.baseline:
+        with tempfile.TemporaryDirectory() as directory:
+            checkout(args.baseline, directory)
+            report['baseline'] = measure(directory, args.baseline_target or args.target, args)
+            report['baseline']['revision'] = args.baseline
+        report['speedup'] = round(
+            report['baseline']['wall_ms']['median'] / report['current']['wall_ms']['median'], 2
+        )
+    for name in ('baseline', 'current'):
+        if name in report:
+            print('{:<9} median {:>7.1f}ms  ({})'.format(
+                name, report[name]['wall_ms']['median'], report[name]['target']), file=sys.stderr)
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+import asyncio
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+#----------------------------------------------------------------------------#
+# Cache backends.
+#----------------------------------------------------------------------------#
+
+class MemoryCache:
+    #In-process LRU cache whose entries also expire ttl seconds after being set
+    blocking = False
+
+    def __init__(self, maxsize=1024, ttl=60):
+      self.maxsize = maxsize
+      self.ttl = ttl
+      self.entries = OrderedDict()
+      self.lock = threading.Lock()
+
+    def get(self, key):
+      with self.lock:
+          entry = self.entries.get(key)
+          if entry is None:
+              return None
+          value, expires = entry
+          if expires <= time.monotonic():
+              del self.entries[key]
+              return None
+          self.entries.move_to_end(key)
+          return value
+
+    def set(self, key, value, ttl=None):
+      expires = time.monotonic() + (self.ttl if ttl is None else ttl)
+      with self.lock:
+          self.entries[key] = (value, expires)
+          self.entries.move_to_end(key)
+          while len(self.entries) > self.maxsize:
+              self.entries.popitem(last=False)
+
+    def delete(self, *keys):
+      with self.lock:
+          for key in keys:
+              self.entries.pop(key, None)
+
+    def clear(self):
+      with self.lock:
+          self.entries.clear()
+
+    def __len__(self):
+      return len(self.entries)
+
+class RedisCache:
+    #Cache shared between workers, stored in Redis. client is anything with
+    # the get/set/delete methods of redis.Redis, so tests can pass a fake
+    # Every call waits on the network
+    blocking = True
+
+    def __init__(self, client, ttl=60, prefix='fyyur:'):
+      self.client = client
+      self.ttl = ttl
+      self.prefix = prefix
+
+    def get(self, key):
+      data = self.client.get(self.prefix + key)
+      return None if data is None else pickle.loads(data)
+
+    def set(self, key, value, ttl=None):
+      self.client.set(self.prefix + key, pickle.dumps(value), ex=self.ttl if ttl is None else ttl)
+
+    def delete(self, *keys):
+      if keys:
+          self.client.delete(*[self.prefix + key for key in keys])
+
+    def clear(self):
+      keys = list(self.client.scan_iter(self.prefix + '*'))
+      if keys:
+          self.client.delete(*keys)
+
+def make_cache(config, maxsize=None, ttl=None):
+    #Builds the cache backend selected by CACHE_BACKEND ('memory' or 'redis'),
+    # sized by CACHE_MAXSIZE and CACHE_TTL unless maxsize or ttl are given
+    ttl = config['CACHE_TTL'] if ttl is None else ttl
+    if config['CACHE_BACKEND'] == 'redis':
+        import redis
+        client = redis.Redis.from_url(config['CACHE_REDIS_URL'])
+        return RedisCache(client, ttl=ttl)
+    return MemoryCache(maxsize=config['CACHE_MAXSIZE'] if maxsize is None else maxsize, ttl=ttl)
+
+async def call_async(cache, method, *args):
+    #Calls a method of cache from async code. Backends that wait on the
+    # network run on a thread, so they never block the event loop
+    if cache.blocking:
+        return await asyncio.to_thread(getattr(cache, method), *args)
+    return getattr(cache, method)(*args)
+
+def cached(cache, key, load, version=None):
+    #Returns the cached value of key, loading and storing it on a miss. The
+    # value is stored with version, and an entry of any other version is a
+    # miss too: pages are cached under the version their ETag is built from,
+    # so a process that missed an invalidation never sends an older page
+    # under a newer ETag
+    entry = cache.get(key)
+    if entry is not None and entry[0] == version:
+        return entry[1]
+    value = load()
+    cache.set(key, (version, value))
+    return value
+
+def venue_key(venue_id):
+    return 'venue:{}'.format(venue_id)
+
+def artist_key(artist_id):
+    return 'artist:{}'.format(artist_id)
@@ -0,0 +1,48 @@
+import hashlib
+from datetime import timezone
+
+from flask import current_app, make_response, request
+
+#----------------------------------------------------------------------------#
+# Conditional GET.
+#----------------------------------------------------------------------------#
+
+def entity_tag(*parts):
+    #Builds an ETag from the values that identify one version of a page,
+    # e.g. an id and an updated_at
+    return hashlib.blake2b(repr(parts).encode(), digest_size=16).hexdigest()
+
+def as_utc(value):
+    #SQLite returns naive datetimes for timezone aware columns
+    if value is not None and value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value
+
+def is_fresh(etag, last_modified, request=request):
+    #If-None-Match wins over If-Modified-Since, as RFC 7232 requires. The
+    # async routes of asgi.py pass their own request
+    if request.if_none_match:
+        return request.if_none_match.contains_weak(etag)
+    if request.if_modified_since and last_modified is not None:
+        return as_utc(last_modified).replace(microsecond=0) <= request.if_modified_since
+    return False
+
+def conditional(etag, last_modified, render, weak=True):
+    #Answers with 304 Not Modified, without calling render, when the client's
+    # copy matches etag or is not older than last_modified. Otherwise returns
+    # the response of render() with both validators set
+    #Tags built from the DB state rather than the body are weak by default
+    if is_fresh(etag, last_modified):
+        response = current_app.response_class(status=304)
+    else:
+        response = make_response(render())
+        if response.status_code != 200:
+            return response
+    return set_validators(response, etag, last_modified, weak)
+
+def set_validators(response, etag, last_modified, weak=True):
+    response.set_etag(etag, weak=weak)
+    if last_modified is not None:
+        response.last_modified = as_utc(last_modified)
+    response.cache_control.no_cache = True
+    return response
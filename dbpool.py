@@ -0,0 +1,120 @@
+import threading
+import time
+
+from sqlalchemy import event, exc
+from sqlalchemy.pool import QueuePool
+
+#----------------------------------------------------------------------------#
+# Connection pool instrumentation.
+#----------------------------------------------------------------------------#
+
+class PoolStats:
+    #Counters of the connection pool of this process
+    def __init__(self):
+      self.lock = threading.Lock()
+      self.reset()
+
+    def reset(self):
+      with self.lock:
+          self.connects = 0
+          self.checkouts = 0
+          self.checkins = 0
+          self.invalidations = 0
+          self.overflow_checkouts = 0
+          self.timeouts = 0
+          self.wait_count = 0
+          self.wait_total = 0.0
+          self.wait_max = 0.0
+
+    def record_wait(self, seconds):
+      with self.lock:
+          self.wait_count += 1
+          self.wait_total += seconds
+          self.wait_max = max(self.wait_max, seconds)
+
+    def increment(self, name):
+      with self.lock:
+          setattr(self, name, getattr(self, name) + 1)
+
+    def snapshot(self, pool):
+      #Output = dict of the live pool state and the counters, times in ms
+      data = {'pool': pool.__class__.__name__, 'status': pool.status()}
+      if isinstance(pool, QueuePool):
+          data.update(
+              size=pool.size(),
+              checked_in=pool.checkedin(),
+              checked_out=pool.checkedout(),
+              overflow=max(pool.overflow(), 0),
+          )
+      with self.lock:
+          data.update(
+              connects=self.connects,
+              checkouts=self.checkouts,
+              checkins=self.checkins,
+              invalidations=self.invalidations,
+              overflow_checkouts=self.overflow_checkouts,
+              timeouts=self.timeouts,
+              wait_avg_ms=self.wait_total / self.wait_count * 1000 if self.wait_count else 0.0,
+              wait_max_ms=self.wait_max * 1000,
+          )
+      return data
+
+stats = PoolStats()
+
+class InstrumentedQueuePool(QueuePool):
+    #QueuePool that records how long each checkout waited for a connection,
+    # whether it opened an overflow connection and how many gave up after
+    # pool_timeout. QueuePool._do_get calls itself again when it loses the
+    # race for an overflow slot, so only the outermost call records a wait,
+    # and the clock stops before a new connection is opened
+    def __init__(self, *args, **kw):
+      super().__init__(*args, **kw)
+      self._checkout = threading.local()
+
+    def _do_get(self):
+      checkout = self._checkout
+      if getattr(checkout, 'start', None) is not None:
+          return super()._do_get()
+      checkout.start = time.perf_counter()
+      checkout.waited = None
+      try:
+          return super()._do_get()
+      except exc.TimeoutError:
+          stats.increment('timeouts')
+          raise
+      finally:
+          self._stop_wait()
+          stats.record_wait(checkout.waited)
+          checkout.start = None
+
+    def _stop_wait(self):
+      checkout = self._checkout
+      if checkout.waited is None:
+          checkout.waited = time.perf_counter() - checkout.start
+
+    def _inc_overflow(self):
+      #Called by _do_get before it opens a connection. overflow() counts up
+      # from -pool_size, so it is only positive once the connection opened is
+      # beyond pool_size; checkouts reusing a pooled connection never get here
+      opened = super()._inc_overflow()
+      if opened:
+          self._stop_wait()
+          if self.overflow() > 0:
+              stats.increment('overflow_checkouts')
+      return opened
+
+@event.listens_for(InstrumentedQueuePool, 'connect')
+def on_connect(dbapi_connection, connection_record):
+    stats.increment('connects')
+
+@event.listens_for(InstrumentedQueuePool, 'checkout')
+def on_checkout(dbapi_connection, connection_record, connection_proxy):
+    stats.increment('checkouts')
+
+@event.listens_for(InstrumentedQueuePool, 'checkin')
+def on_checkin(dbapi_connection, connection_record):
+    stats.increment('checkins')
+
+@event.listens_for(InstrumentedQueuePool, 'invalidate')
+def on_invalidate(dbapi_connection, connection_record, exception):
+    stats.increment('invalidations')
@@ -0,0 +1,126 @@
+import csv
+import io
+import json
+import sys
+import zlib
+from datetime import datetime
+from itertools import groupby
+
+import click
+from flask.cli import with_appcontext
+
+from model import db, Venue, Artist, Show
+
+#----------------------------------------------------------------------------#
+# Bulk export.
+#----------------------------------------------------------------------------#
+
+VENUE_FIELDS = ['id', 'name', 'city', 'state', 'address', 'phone', 'genres', 'image_link',
+                'facebook_link', 'website_link', 'seeking_talent', 'seeking_description']
+ARTIST_FIELDS = ['id', 'name', 'city', 'state', 'phone', 'genres', 'image_link',
+                 'facebook_link', 'website_link', 'seeking_venue', 'seeking_description']
+SHOW_FIELDS = ['id', 'venue_id', 'artist_id', 'start_time']
+
+FORMATS = ('jsonl', 'csv')
+CHUNK_SIZE = 64 * 1024
+
+def stream(query, batch_size=1000):
+    #Reads query through a server-side cursor, batch_size rows at a time
+    return query.execution_options(stream_results=True).yield_per(batch_size)
+
+def with_shows(model, fields, show_key):
+    #Yields one record per venue or artist with the list of its shows, read by
+    # a single ordered outer join and grouped on the fly
+    columns = [getattr(model, field) for field in fields]
+    query = (
+        db.session.query(*columns, Show.id.label('show_id'), getattr(Show, show_key), Show.start_time)
+        .outerjoin(Show, getattr(Show, model.__tablename__ + '_id') == model.id)
+        .order_by(model.id, Show.start_time, Show.id)
+    )
+    for _, rows in groupby(stream(query), key=lambda row: row[0]):
+        rows = list(rows)
+        record = dict(zip(fields, rows[0]))
+        record['shows'] = [
+            {'id': row.show_id, show_key: getattr(row, show_key), 'start_time': row.start_time}
+            for row in rows if row.show_id is not None
+        ]
+        yield record
+
+def records(entity):
+    if entity == 'venues':
+        return VENUE_FIELDS + ['shows'], with_shows(Venue, VENUE_FIELDS, 'artist_id')
+    if entity == 'artists':
+        return ARTIST_FIELDS + ['shows'], with_shows(Artist, ARTIST_FIELDS, 'venue_id')
+    if entity == 'shows':
+        query = db.session.query(*[getattr(Show, field) for field in SHOW_FIELDS]).order_by(Show.id)
+        return SHOW_FIELDS, (row._asdict() for row in stream(query))
+    raise ValueError('unknown entity {}'.format(entity))
+
+def json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(repr(value))
+
+def jsonl_lines(fields, rows):
+    for row in rows:
+        yield json.dumps(row, default=json_default, separators=(',', ':')) + '\n'
+
+def csv_lines(fields, rows):
+    #Genres are joined with ';' like the import files expect and the shows of
+    # a venue or artist are written as a JSON array
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(fields)
+    for row in rows:
+        writer.writerow([
+            ';'.join(value) if field == 'genres' and value is not None
+            else json.dumps(value, default=json_default, separators=(',', ':')) if field == 'shows'
+            else value.isoformat() if isinstance(value, datetime)
+            else value
+            for field, value in ((field, row[field]) for field in fields)
+        ])
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+
+def export(entity, format, compress=False):
+    #Generates the export of entity as bytes chunks of about CHUNK_SIZE,
+    # gzip compressed when compress is set
+    #Raises ValueError for an unknown entity or format
+    if format not in FORMATS:
+        raise ValueError('unknown format {}'.format(format))
+    fields, rows = records(entity)
+    lines = jsonl_lines(fields, rows) if format == 'jsonl' else csv_lines(fields, rows)
+    compressor = zlib.compressobj(wbits=31) if compress else None
+    chunk = []
+    size = 0
+    for line in lines:
+        chunk.append(line)
+        size += len(line)
+        if size >= CHUNK_SIZE:
+            data = ''.join(chunk).encode()
+            chunk, size = [], 0
+            data = compressor.compress(data) if compressor else data
+            if data:
+                yield data
+    data = ''.join(chunk).encode()
+    if compressor:
+        data = compressor.compress(data) + compressor.flush()
+    if data:
+        yield data
+
+@click.command('export')
+@click.argument('entity', type=click.Choice(['venues', 'artists', 'shows']))
+@click.option('--format', 'format', type=click.Choice(FORMATS), default='jsonl', show_default=True)
+@click.option('--output', '-o', default='-', help='file to write, gzipped when it ends in .gz (default: stdout)')
+@with_appcontext
+def export_command(entity, format, output):
+    """Export venues or artists with their shows, or all shows, as JSON Lines or CSV."""
+    compress = output.endswith('.gz')
+    out = sys.stdout.buffer if output == '-' else open(output, 'wb')
+    try:
+        for chunk in export(entity, format, compress):
+            out.write(chunk)
+    finally:
+        if out is not sys.stdout.buffer:
+            out.close()
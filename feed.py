@@ -0,0 +1,101 @@
+import logging
+import os
+import threading
+
+from model import db, Artist, HomeFeed, Show, Shows, Venue, profile_columns, utcnow
+
+logger = logging.getLogger(__name__)
+
+#----------------------------------------------------------------------------#
+# Home page feed.
+#----------------------------------------------------------------------------#
+
+def build_feed(size, now):
+    #Reads the next size upcoming shows, on the (start_time, id) index of
+    # show, and the size most recently listed venues and artists
+    #Output = HomeFeed
+    shows = (
+        db.session.query(
+            Show.venue_id,
+            Venue.name.label('venue_name'),
+            Show.artist_id,
+            Artist.name.label('artist_name'),
+            Artist.image_link,
+            Show.start_time,
+            Venue.updated_at.label('venue_updated_at'),
+            Artist.updated_at.label('artist_updated_at'),
+        )
+        .join(Venue, Show.venue_id == Venue.id)
+        .join(Artist, Show.artist_id == Artist.id)
+        .filter(Show.start_time > now)
+        .order_by(Show.start_time, Show.id)
+        .limit(size)
+    )
+    return HomeFeed(
+        upcoming_shows=[Shows(*show) for show in shows],
+        venues=db.session.query(*profile_columns(Venue, 'listing')).order_by(Venue.id.desc()).limit(size).all(),
+        artists=db.session.query(*profile_columns(Artist, 'listing')).order_by(Artist.id.desc()).limit(size).all(),
+        built_at=now,
+    )
+
+class Feed:
+    #In-memory snapshot of the home page feed of this process. Requests read
+    # the current snapshot and never query; a background thread rebuilds it
+    # every interval seconds, and right away when a write calls changed().
+    # The thread is started on first use in each process, like the job
+    # workers, so workers forked from a preloaded master get their own
+    def __init__(self, app, size=6, interval=30):
+      self.app = app
+      self.size = size
+      self.interval = interval
+      self.snapshot = None
+      self.builds = 0
+      self.wakeup = threading.Event()
+      self.lock = threading.Lock()
+      self.pid = None
+
+    def ensure_started(self):
+      if self.pid == os.getpid():
+          return
+      with self.lock:
+          if self.pid == os.getpid():
+              return
+          threading.Thread(target=self.run, name='home-feed', daemon=True).start()
+          self.pid = os.getpid()
+
+    def run(self):
+      while True:
+          self.wakeup.wait(self.interval)
+          # Writes landing during a rebuild wake the next one, bursts of
+          # writes are folded into a single rebuild
+          self.wakeup.clear()
+          try:
+              with self.app.app_context():
+                  self.refresh()
+          except Exception:
+              logger.exception('home feed refresh failed')
+
+    def refresh(self):
+      #Replacing the reference is atomic, readers see the old or new snapshot
+      self.snapshot = build_feed(self.size, utcnow())
+      self.builds += 1
+
+    def changed(self):
+      #Called after a write: the snapshot is rebuilt in the background
+      self.ensure_started()
+      self.wakeup.set()
+
+    def get(self):
+      #Output = the current HomeFeed, only built in the request by the first
+      # request of a process
+      self.ensure_started()
+      if self.snapshot is None:
+          with self.lock:
+              if self.snapshot is None:
+                  self.refresh()
+      return self.snapshot
+
+def init_feed(app):
+    feed = Feed(app, size=app.config['HOME_FEED_SIZE'], interval=app.config['HOME_FEED_REFRESH_INTERVAL'])
+    app.extensions['feed'] = feed
+    return feed
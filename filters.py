@@ -0,0 +1,43 @@
+from datetime import datetime
+from functools import lru_cache
+
+#----------------------------------------------------------------------------#
+# Filters.
+#----------------------------------------------------------------------------#
+
+# Babel patterns of the named formats, parsed once on first use
+FORMATS = {
+    'full': "EEEE MMMM, d, y 'at' h:mma",
+    'medium': "EE MM, dd, y h:mma",
+}
+
+@lru_cache(maxsize=None)
+def locale():
+    #babel and its locale data are loaded by the first date formatted, not
+    # when the app starts
+    from babel import Locale
+    return Locale.parse('en')
+
+@lru_cache(maxsize=None)
+def pattern(format):
+    from babel.dates import parse_pattern
+    return parse_pattern(FORMATS[format])
+
+def parse_datetime(value):
+    #Datetimes are used as they are and ISO strings such as the stored
+    # '%Y-%m-%d %H:%M:%S' are parsed natively; dateutil only handles the rest
+    if isinstance(value, datetime):
+        return value
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        import dateutil.parser
+        return dateutil.parser.parse(value)
+
+@lru_cache(maxsize=4096)
+def format_datetime(value, format='medium'):
+    date = parse_datetime(value)
+    if format not in FORMATS:
+        from babel.dates import format_datetime as babel_format_datetime
+        return babel_format_datetime(date, format, locale=locale())
+    return pattern(format).apply(date, locale())
@@ -88,6 +88,22 @@ class State(Enum):
     def choices(cls):
         return [(choice.name, choice.value) for choice in cls]
 
+class LazyChoices:
+    # Choices of an enum, built when the first form using them is created and
+    # then shared by the venue and artist forms. Fields copy their choices
+    # with list(), so iterating is all they need
+    def __init__(self, enum):
+        self.enum = enum
+        self.choices = None
+
+    def __iter__(self):
+        if self.choices is None:
+            self.choices = self.enum.choices()
+        return iter(self.choices)
+
+STATE_CHOICES = LazyChoices(State)
+GENRE_CHOICES = LazyChoices(Genre)
+
 class ShowForm(Form):
     artist_id = StringField(
         'artist_id'
@@ -98,7 +114,9 @@ class ShowForm(Form):
     start_time = DateTimeField(
         'start_time',
         validators=[DataRequired()],
-        default= datetime.today()
+        # a callable, so each form gets the time it is shown and not the
+        # time the module was imported
+        default=datetime.today
     )
 
 class VenueForm(Form):
@@ -110,7 +128,7 @@ class VenueForm(Form):
     )
     state = SelectField(
         'state', validators=[DataRequired()],
-        choices=State.choices()
+        choices=STATE_CHOICES
     )
     address = StringField(
         'address', validators=[DataRequired()]
@@ -125,7 +143,7 @@ class VenueForm(Form):
         'genres', 
         validators=[DataRequired()],
         
-        choices=Genre.choices()
+        choices=GENRE_CHOICES
     )
     facebook_link = StringField(
         'facebook_link', validators=[URL()]
@@ -149,7 +167,7 @@ class ArtistForm(Form):
     )
     state = SelectField(
         'state', validators=[DataRequired()],
-        choices=State.choices()
+        choices=STATE_CHOICES
     )
     phone = StringField(
         'phone'
@@ -159,7 +177,7 @@ class ArtistForm(Form):
     )
     genres = SelectMultipleField(
         'genres', validators=[DataRequired()],
-        choices=Genre.choices()
+        choices=GENRE_CHOICES
      )
     facebook_link = StringField(
         # TODO implement enum restriction
@@ -0,0 +1,105 @@
+import threading
+from datetime import datetime
+
+from jinja2 import nodes
+from jinja2.ext import Extension
+
+from cache import call_async, make_cache
+
+#----------------------------------------------------------------------------#
+# Template fragment cache.
+#----------------------------------------------------------------------------#
+
+class FragmentStats:
+    #Hit and miss counters of the fragment cache of this process
+    def __init__(self):
+      self.lock = threading.Lock()
+      self.hits = 0
+      self.misses = 0
+
+    def record(self, hit):
+      with self.lock:
+          if hit:
+              self.hits += 1
+          else:
+              self.misses += 1
+
+    def snapshot(self, cache):
+      #Output = dict of the counters and, for the memory backend, its size
+      with self.lock:
+          hits, misses = self.hits, self.misses
+      data = {
+          'backend': cache.__class__.__name__ if cache is not None else None,
+          'hits': hits,
+          'misses': misses,
+          'hit_ratio': hits / (hits + misses) if hits + misses else 0.0,
+      }
+      if hasattr(cache, '__len__'):
+          data['size'] = len(cache)
+      return data
+
+def fragment_key(key):
+    #Turns the key of a cache block, a value or a tuple such as
+    # ('venue-show', artist_id, artist_updated_at, start_time), into a string
+    parts = key if isinstance(key, (tuple, list)) else (key,)
+    return 'fragment:' + ':'.join(
+        part.isoformat() if isinstance(part, datetime) else str(part) for part in parts
+    )
+
+class FragmentCacheExtension(Extension):
+    #Adds {% cache key[, ttl] %}...{% endcache %} blocks, whose rendered body
+    # is stored in environment.fragment_cache under key. Without a cache the
+    # body is rendered every time
+    tags = {'cache'}
+
+    def __init__(self, environment):
+      super().__init__(environment)
+      environment.extend(fragment_cache=None, fragment_stats=FragmentStats())
+
+    def parse(self, parser):
+      lineno = next(parser.stream).lineno
+      args = [parser.parse_expression()]
+      if parser.stream.skip_if('comma'):
+          args.append(parser.parse_expression())
+      else:
+          args.append(nodes.Const(None))
+      body = parser.parse_statements(['name:endcache'], drop_needle=True)
+      return nodes.CallBlock(self.call_method('_render', args), [], [], body).set_lineno(lineno)
+
+    def _render(self, key, ttl, caller):
+      #In async environments (enable_async) caller returns a coroutine
+      if self.environment.is_async:
+          return self._render_async(key, ttl, caller)
+      cache = self.environment.fragment_cache
+      if cache is None:
+          return caller()
+      key = fragment_key(key)
+      value = cache.get(key)
+      self.environment.fragment_stats.record(value is not None)
+      if value is None:
+          value = caller()
+          cache.set(key, value, ttl)
+      return value
+
+    async def _render_async(self, key, ttl, caller):
+      cache = self.environment.fragment_cache
+      if cache is None:
+          return await caller()
+      key = fragment_key(key)
+      value = await call_async(cache, 'get', key)
+      self.environment.fragment_stats.record(value is not None)
+      if value is None:
+          value = await caller()
+          await call_async(cache, 'set', key, value, ttl)
+      return value
+
+def init_fragment_cache(app):
+    #Registers the cache tag on app's templates and builds its backend from
+    # FRAGMENT_CACHE_* (the backend itself follows CACHE_BACKEND)
+    app.jinja_env.add_extension(FragmentCacheExtension)
+    if app.config['FRAGMENT_CACHE']:
+        app.jinja_env.fragment_cache = make_cache(
+            app.config,
+            maxsize=app.config['FRAGMENT_CACHE_MAXSIZE'],
+            ttl=app.config['FRAGMENT_CACHE_TTL'],
+        )
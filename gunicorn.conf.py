@@ -0,0 +1,71 @@
+#----------------------------------------------------------------------------#
+# gunicorn settings, read automatically from the working directory:
+#
+#   gunicorn wsgi:app
+#
+# The app is loaded once in the master (preload_app) and forked into the
+# workers, which share its memory copy-on-write. Every worker then opens its
+# own DB connections, see post_fork.
+#----------------------------------------------------------------------------#
+
+import gc
+import multiprocessing
+import os
+import time
+
+bind = '0.0.0.0:{}'.format(os.environ.get('PORT', 5000))
+
+# WEB_CONCURRENCY is the variable Heroku sets from the dyno size
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+worker_class = 'gthread' if threads > 1 else 'sync'
+preload_app = True
+
+# Workers silent for timeout seconds are killed and replaced; on restart or
+# SIGTERM they get graceful_timeout seconds to finish their requests
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', 30))
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', 5))
+
+# Recycle workers now and then so slow leaks can't grow forever
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 10000))
+max_requests_jitter = int(os.environ.get('GUNICORN_MAX_REQUESTS_JITTER', 1000))
+
+# Heartbeat files on tmpfs, so a slow disk can't make workers look dead
+worker_tmp_dir = '/dev/shm' if os.path.isdir('/dev/shm') else None
+
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG', '-')
+errorlog = '-'
+
+started = time.monotonic()
+
+
+def when_ready(server):
+    #Runs in the master once the app is loaded, before the workers fork.
+    # Freezing the loaded objects keeps the garbage collector from touching
+    # (and so copying) their pages in every worker
+    import wsgi
+    gc.freeze()
+    server.log.info(
+        'app loaded in %.0fms, master ready in %.0fms',
+        wsgi.load_seconds * 1000, (time.monotonic() - started) * 1000,
+    )
+
+
+def post_fork(server, worker):
+    #Connections the master may have opened must not be shared with the
+    # workers: drop them from this worker's pool without closing them, which
+    # would also close them for the master and the other workers
+    from model import db
+    from wsgi import app
+    import dbpool
+    with app.app_context():
+        db.get_engine(app).dispose(close=False)
+    dbpool.stats.reset()
+    worker.forked_at = time.monotonic()
+
+
+def post_worker_init(worker):
+    worker.log.info(
+        'worker %s booted in %.0fms', worker.pid, (time.monotonic() - worker.forked_at) * 1000
+    )
@@ -0,0 +1,273 @@
+import csv
+import gzip
+import io
+import json
+import sys
+import time
+from datetime import datetime, timezone
+
+import click
+from flask.cli import with_appcontext
+from werkzeug.datastructures import MultiDict
+
+from model import db, Venue, Artist, Show
+from stats import rebuild_show_stats
+
+#----------------------------------------------------------------------------#
+# Bulk import.
+#----------------------------------------------------------------------------#
+
+VENUE_COLUMNS = ['id', 'name', 'city', 'state', 'address', 'phone', 'genres', 'image_link',
+                 'facebook_link', 'website_link', 'seeking_talent', 'seeking_description']
+ARTIST_COLUMNS = ['id', 'name', 'city', 'state', 'phone', 'genres', 'image_link',
+                  'facebook_link', 'website_link', 'seeking_venue', 'seeking_description']
+SHOW_COLUMNS = ['id', 'venue_id', 'artist_id', 'start_time']
+
+FALSE_VALUES = ('', '0', 'false', 'f', 'no', 'n')
+
+def open_text(path):
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rt', newline='', encoding='utf-8')
+    return open(path, newline='', encoding='utf-8')
+
+def read_rows(path):
+    #Streams the rows of a CSV or JSON Lines file (optionally gzipped) as
+    # (line number, dict) without reading the whole file
+    with open_text(path) as f:
+        if '.jsonl' in path or '.ndjson' in path:
+            for number, line in enumerate(f, 1):
+                if line.strip():
+                    yield number, json.loads(line)
+        else:
+            for number, row in enumerate(csv.DictReader(f), 2):
+                yield number, row
+
+def form_data(row):
+    #Turns a file row into the form data a browser would post: genres may be
+    # a list or a ';' separated string and unchecked booleans are left out
+    data = MultiDict()
+    for key, value in row.items():
+        if value is None:
+            continue
+        if key == 'genres':
+            genres = value if isinstance(value, list) else value.split(';')
+            data.setlist(key, [genre.strip() for genre in genres if genre.strip()])
+        elif key in ('seeking_talent', 'seeking_venue'):
+            if str(value).strip().lower() not in FALSE_VALUES:
+                data[key] = 'y'
+        else:
+            data[key] = str(value)
+    return data
+
+class RowValidator:
+    #Validates rows with the fields and validators of a form class. Each
+    # field is checked on its own and the outcome is memoized per raw value,
+    # since an import repeats the same states, genres and links many times.
+    # Field defaults are not applied: they are meant for forms shown to a
+    # user (ShowForm's start_time defaults to now), and a missing value in a
+    # file is an error of that row
+    def __init__(self, form_class, cache_size=100000):
+      self.form = form_class(formdata=None, meta={'csrf': False})
+      self.cache_size = cache_size
+      self.cache = {}
+
+    def validate(self, data):
+      #Output = (dict of field data, dict of field errors)
+      values = {}
+      errors = {}
+      for name, field in self.form._fields.items():
+          key = (name, tuple(data.getlist(name)))
+          result = self.cache.get(key)
+          if result is None:
+              field.process(data, data=None)
+              field.validate(self.form)
+              result = (field.data, list(field.errors))
+              if len(self.cache) >= self.cache_size:
+                  self.cache.clear()
+              self.cache[key] = result
+          values[name], field_errors = result
+          if field_errors:
+              errors[name] = field_errors
+      return values, errors
+
+def show_row_form():
+    #Output = ShowForm whose start_time also reads ISO 8601 timestamps, as
+    # the exporter writes them (2026-10-21T05:14:01.998158+00:00), besides
+    # the form's own '%Y-%m-%d %H:%M:%S'
+    from wtforms import DateTimeField
+    from wtforms.validators import DataRequired
+    from forms import ShowForm
+
+    class ISODateTimeField(DateTimeField):
+        def process_formdata(self, valuelist):
+          try:
+              self.data = datetime.fromisoformat(' '.join(valuelist).strip())
+          except ValueError:
+              super().process_formdata(valuelist)
+
+    class ShowRowForm(ShowForm):
+        start_time = ISODateTimeField('start_time', validators=[DataRequired()])
+
+    return ShowRowForm
+
+class Importer:
+    #Validates rows like the create forms and inserts them in batches. The
+    # source ids of imported venues and artists are mapped to the ids they get
+    # in the database, so the shows imported after them can reference them.
+    # Those ids are never used to match existing rows: every imported row is
+    # inserted as a new one, so importing a file twice stores it twice
+    def __init__(self, batch_size=5000, max_errors=100, out=sys.stderr):
+      self.batch_size = batch_size
+      self.max_errors = max_errors
+      self.out = out
+      self.ids = {'venue': None, 'artist': None}
+      self.postgresql = db.engine.dialect.name == 'postgresql'
+
+    # The forms are imported here rather than with the module, which the app
+    # imports at startup to register the command
+
+    def import_venues(self, path):
+      from forms import VenueForm
+      return self.run(path, Venue, VenueForm, VENUE_COLUMNS, 'venue')
+
+    def import_artists(self, path):
+      from forms import ArtistForm
+      return self.run(path, Artist, ArtistForm, ARTIST_COLUMNS, 'artist')
+
+    def import_shows(self, path):
+      return self.run(path, Show, show_row_form(), SHOW_COLUMNS, None, self.show_values)
+
+    def show_values(self, values):
+      venue_id = self.resolve('venue', values['venue_id'])
+      artist_id = self.resolve('artist', values['artist_id'])
+      if venue_id is None or artist_id is None:
+          raise ValueError('unknown venue_id or artist_id')
+      return dict(venue_id=venue_id, artist_id=artist_id, start_time=values['start_time'])
+
+    def resolve(self, entity, source_id):
+      #Maps the id of a venue or artist in the import files to its database
+      # id. Without an import of that entity in this run, ids are taken to be
+      # database ids and checked against the ids already stored
+      if self.ids[entity] is None:
+          model = Venue if entity == 'venue' else Artist
+          self.ids[entity] = {str(id): id for id, in db.session.query(model.id).yield_per(10000)}
+      return self.ids[entity].get(str(source_id).strip())
+
+    def allocate_ids(self, model, count):
+      #Reserves count ids from the table's sequence so rows can be inserted
+      # with their ids known in advance
+      table = model.__tablename__
+      if self.postgresql:
+          return [id for id, in db.session.execute(
+              db.text("SELECT nextval(pg_get_serial_sequence(:table, 'id')) FROM generate_series(1, :count)"),
+              {'table': table, 'count': count},
+          )]
+      start = (db.session.query(db.func.max(model.id)).scalar() or 0) + 1
+      return list(range(start, start + count))
+
+    def run(self, path, model, form_class, columns, entity, convert=dict):
+      #The form fields of venues and artists are named like their columns,
+      # show rows go through convert to resolve their venue and artist
+      validator = RowValidator(form_class)
+      if entity is not None:
+          self.ids[entity] = {}
+      start = time.perf_counter()
+      imported = rejected = 0
+      batch = []
+      for number, row in read_rows(path):
+          values, errors = validator.validate(form_data(row))
+          try:
+              if errors:
+                  raise ValueError('; '.join(
+                      '{}: {}'.format(field, ', '.join(messages)) for field, messages in errors.items()
+                  ))
+              batch.append((row.get('id'), convert(values)))
+          except ValueError as error:
+              rejected += 1
+              if rejected <= self.max_errors:
+                  click.echo('{}:{}: {}'.format(path, number, error), file=self.out)
+              continue
+          if len(batch) >= self.batch_size:
+              imported += self.flush(model, columns, entity, batch)
+              batch = []
+      if batch:
+          imported += self.flush(model, columns, entity, batch)
+      elapsed = time.perf_counter() - start
+      click.echo('{}: imported {} {} rows, rejected {} in {:.1f}s ({:.0f} rows/s)'.format(
+          path, imported, model.__tablename__, rejected, elapsed, imported / elapsed if elapsed else 0,
+      ), file=self.out)
+      return imported, rejected
+
+    def flush(self, model, columns, entity, batch):
+      ids = self.allocate_ids(model, len(batch))
+      rows = []
+      for id, (source_id, row) in zip(ids, batch):
+          row['id'] = id
+          rows.append(row)
+          if entity is not None and source_id not in (None, ''):
+              self.ids[entity][str(source_id).strip()] = id
+      if self.postgresql:
+          self.copy(model, columns, rows)
+      else:
+          db.session.execute(model.__table__.insert(), rows)
+      db.session.commit()
+      return len(rows)
+
+    def copy(self, model, columns, rows):
+      #Sends a batch through COPY FROM STDIN, the fastest way into PostgreSQL
+      buffer = io.StringIO()
+      writer = csv.writer(buffer)
+      for row in rows:
+          writer.writerow([copy_value(row[column]) for column in columns])
+      buffer.seek(0)
+      cursor = db.session.connection().connection.cursor()
+      cursor.copy_expert(
+          'COPY {} ({}) FROM STDIN WITH (FORMAT csv)'.format(
+              model.__tablename__, ', '.join('"{}"'.format(column) for column in columns)
+          ),
+          buffer,
+      )
+
+def copy_value(value):
+    #Formats a value for COPY's csv format, where an unquoted empty field is NULL
+    if value is None:
+        return None
+    if isinstance(value, bool):
+        return 't' if value else 'f'
+    if isinstance(value, list):
+        return '{' + ','.join(
+            '"{}"'.format(item.replace('\\', '\\\\').replace('"', '\\"')) for item in value
+        ) + '}'
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return value
+
+@click.command('import')
+@click.option('--venues', 'venues', type=click.Path(exists=True, dir_okay=False), help='CSV or JSONL file of venues')
+@click.option('--artists', 'artists', type=click.Path(exists=True, dir_okay=False), help='CSV or JSONL file of artists')
+@click.option('--shows', 'shows', type=click.Path(exists=True, dir_okay=False), help='CSV or JSONL file of shows')
+@click.option('--batch-size', default=5000, show_default=True, help='rows inserted per batch')
+@click.option('--max-errors', default=100, show_default=True, help='rejected rows reported')
+@with_appcontext
+def import_command(venues, artists, shows, batch_size, max_errors):
+    """Bulk import venues, artists and shows from CSV or JSON Lines files.
+
+    Rows are validated like the create forms, and show start times may also
+    be ISO 8601 timestamps as written by flask export. Show rows reference
+    the ids venues and artists have in their files when imported in the
+    same run, otherwise their database ids.
+
+    The id column only maps those references. Rows are always inserted
+    with new ids and never update the rows they were exported from, so
+    importing an export into the database it came from duplicates it.
+    """
+    importer = Importer(batch_size=batch_size, max_errors=max_errors)
+    if venues:
+        importer.import_venues(venues)
+    if artists:
+        importer.import_artists(artists)
+    if shows:
+        importer.import_shows(shows)
+        # Bulk inserts skip the show count upkeep of the show form
+        rebuild_show_stats(datetime.now(timezone.utc))
+        db.session.commit()
@@ -0,0 +1,385 @@
+import fcntl
+import hashlib
+import logging
+import os
+import queue
+import tempfile
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+
+from model import db, QueuedJob
+
+logger = logging.getLogger(__name__)
+
+#----------------------------------------------------------------------------#
+# Background jobs.
+#----------------------------------------------------------------------------#
+
+registry = {}
+
+def job(name):
+    #Registers a function as the job called name. It runs in an app context
+    # with the keyword arguments it was enqueued with, which must be JSON
+    # serializable for the postgres backend
+    def decorator(function):
+        registry[name] = function
+        return function
+    return decorator
+
+@dataclass(slots=True)
+class Job:
+    name: str
+    kwargs: dict
+    attempts: int = 0
+    enqueued_at: float = field(default_factory=time.time)
+    id: int = None
+
+class JobStats:
+    #Counters of the jobs run by this process, times in seconds
+    def __init__(self):
+      self.lock = threading.Lock()
+      self.enqueued = 0
+      self.overflow = 0
+      self.completed = 0
+      self.retried = 0
+      self.failed = 0
+      self.wait_total = 0.0
+      self.wait_max = 0.0
+      self.run_total = 0.0
+      self.run_max = 0.0
+
+    def increment(self, name):
+      with self.lock:
+          setattr(self, name, getattr(self, name) + 1)
+
+    def record(self, wait, run):
+      #wait is the time from enqueue to start, run the time the job took
+      with self.lock:
+          self.completed += 1
+          self.wait_total += wait
+          self.wait_max = max(self.wait_max, wait)
+          self.run_total += run
+          self.run_max = max(self.run_max, run)
+
+    def snapshot(self):
+      with self.lock:
+          return dict(
+              enqueued=self.enqueued,
+              overflow=self.overflow,
+              completed=self.completed,
+              retried=self.retried,
+              failed=self.failed,
+              wait_avg_ms=self.wait_total / self.completed * 1000 if self.completed else 0.0,
+              wait_max_ms=self.wait_max * 1000,
+              run_avg_ms=self.run_total / self.completed * 1000 if self.completed else 0.0,
+              run_max_ms=self.run_max * 1000,
+          )
+
+class MemoryQueue:
+    #Bounded in-process queue. Jobs are lost if the process exits before
+    # running them, use PostgresQueue for work that must not be lost
+    def __init__(self, maxsize):
+      self.items = queue.Queue(maxsize)
+
+    def put(self, job):
+      #Raises queue.Full when the queue is full
+      self.items.put_nowait(job)
+
+    def get(self, timeout):
+      try:
+          return self.items.get(timeout=timeout)
+      except queue.Empty:
+          return None
+
+    def done(self, job):
+      pass
+
+    def retry(self, job, delay, error):
+      timer = threading.Timer(delay, self.requeue, (job,))
+      timer.daemon = True
+      timer.start()
+
+    def requeue(self, job):
+      try:
+          self.items.put_nowait(job)
+      except queue.Full:
+          logger.error('job %s dropped on retry, queue full', job.name)
+
+    def fail(self, job, error):
+      pass
+
+    def depth(self):
+      return self.items.qsize()
+
+class PostgresQueue:
+    #Persistent queue in the job table, shared by every process. A worker
+    # claims the next due row with FOR UPDATE SKIP LOCKED, so workers never
+    # wait on each other, and deletes it in the transaction the job runs in:
+    # the row is only gone once the job committed
+    def __init__(self, maxsize, poll_interval):
+      self.maxsize = maxsize
+      self.poll_interval = poll_interval
+
+    def put(self, job):
+      #Raises queue.Full when maxsize jobs are waiting
+      if self.maxsize and self.depth() >= self.maxsize:
+          raise queue.Full
+      # run_at from the database clock, which get() compares it with
+      db.session.add(QueuedJob(name=job.name, args=job.kwargs, run_at=db.func.now()))
+      db.session.commit()
+
+    def get(self, timeout):
+      row = (
+          QueuedJob.query
+          .filter(QueuedJob.failed_at.is_(None), QueuedJob.run_at <= db.func.now())
+          .order_by(QueuedJob.run_at, QueuedJob.id)
+          .with_for_update(skip_locked=True)
+          .first()
+      )
+      if row is None:
+          db.session.rollback()
+          time.sleep(timeout)
+          return None
+      job = Job(row.name, row.args, row.attempts, row.created_at.timestamp(), row.id)
+      db.session.delete(row)
+      return job
+
+    def done(self, job):
+      db.session.commit()
+
+    def retry(self, job, delay, error):
+      self.save(job, error, run_at=datetime.now(timezone.utc) + timedelta(seconds=delay))
+
+    def fail(self, job, error):
+      # Failed jobs stay in the table, with their error, until deleted by hand
+      self.save(job, error, failed_at=datetime.now(timezone.utc))
+
+    def save(self, job, error, **values):
+      #Rolls the job's work back and stores its attempt. The row is inserted
+      # again if the job committed its deletion before failing
+      db.session.rollback()
+      row = QueuedJob.query.get(job.id) or QueuedJob(
+          id=job.id, name=job.name, args=job.kwargs,
+          created_at=datetime.fromtimestamp(job.enqueued_at, timezone.utc),
+      )
+      row.attempts = job.attempts
+      row.last_error = repr(error)
+      for key, value in values.items():
+          setattr(row, key, value)
+      db.session.add(row)
+      db.session.commit()
+
+    def depth(self):
+      return QueuedJob.query.filter(QueuedJob.failed_at.is_(None)).count()
+
+class SchedulerLock:
+    #Elects the one process that runs the schedules of every(), so a job
+    # scheduled every n seconds runs once per n seconds and not once per
+    # process. On PostgreSQL it is a session advisory lock, held on a pool
+    # connection kept for it and released when the process dies; elsewhere an
+    # flock on a file named after the database, which covers one host
+    key = 0x6679797572  # 'fyyur'
+
+    def __init__(self, app):
+      self.app = app
+      self.connection = None
+      self.file = None
+
+    def acquire(self):
+      #Output = True while this process holds the lock. Processes that do not
+      # try again on every call, so one takes over when the holder exits
+      with self.app.app_context():
+          engine = db.engine
+      if engine.dialect.name == 'postgresql':
+          return self.acquire_advisory(engine)
+      return self.acquire_file(str(engine.url))
+
+    def acquire_advisory(self, engine):
+      if self.connection is not None:
+          try:
+              self.connection.exec_driver_sql('SELECT 1')
+              return True
+          except Exception:
+              # The session, and the lock with it, is gone
+              logger.warning('scheduler lock connection lost')
+              self.connection.invalidate()
+              self.connection.close()
+              self.connection = None
+      connection = engine.connect().execution_options(isolation_level='AUTOCOMMIT')
+      if connection.scalar(db.text('SELECT pg_try_advisory_lock(:key)'), {'key': self.key}):
+          self.connection = connection
+          return True
+      connection.close()
+      return False
+
+    def acquire_file(self, url):
+      if self.file is not None:
+          return True
+      name = 'fyyur-scheduler-{}.lock'.format(hashlib.blake2b(url.encode(), digest_size=8).hexdigest())
+      file = open(os.path.join(tempfile.gettempdir(), name), 'a')
+      try:
+          fcntl.flock(file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+      except OSError:
+          file.close()
+          return False
+      self.file = file
+      return True
+
+class JobRunner:
+    #Runs queued jobs on a fixed pool of daemon threads, retrying failures
+    # with exponential backoff. The threads are started on first use in each
+    # process, so workers forked from a preloaded master get their own
+    def __init__(self, app, queue, workers=2, max_attempts=5, retry_delay=0.5,
+                 retry_max_delay=60, poll_interval=1.0):
+      self.app = app
+      self.queue = queue
+      self.workers = workers
+      self.max_attempts = max_attempts
+      self.retry_delay = retry_delay
+      self.retry_max_delay = retry_max_delay
+      self.poll_interval = poll_interval
+      self.stats = JobStats()
+      self.schedules = []
+      self.scheduler_lock = SchedulerLock(app)
+      self.lock = threading.Lock()
+      self.pid = None
+      self.threads = []
+
+    def ensure_started(self):
+      if self.pid == os.getpid():
+          return
+      with self.lock:
+          if self.pid == os.getpid():
+              return
+          self.threads = [
+              threading.Thread(target=self.work, name='job-worker-{}'.format(i), daemon=True)
+              for i in range(self.workers)
+          ]
+          if self.schedules:
+              self.threads.append(threading.Thread(target=self.schedule, name='job-scheduler', daemon=True))
+          for thread in self.threads:
+              thread.start()
+          self.pid = os.getpid()
+
+    def every(self, seconds, name, **kwargs):
+      #Enqueues the job called name every seconds. Every process runs a
+      # scheduler once its workers started, but only the one holding the
+      # SchedulerLock enqueues
+      self.schedules.append((seconds, name, kwargs))
+
+    def schedule(self):
+      due = [time.monotonic() + seconds for seconds, _, _ in self.schedules]
+      while True:
+          time.sleep(max(min(due) - time.monotonic(), 0))
+          for i, (seconds, name, kwargs) in enumerate(self.schedules):
+              if due[i] <= time.monotonic():
+                  due[i] = time.monotonic() + seconds
+                  try:
+                      if not self.scheduler_lock.acquire():
+                          continue
+                      with self.app.app_context():
+                          self.enqueue(name, **kwargs)
+                  except Exception:
+                      logger.exception('scheduling job %s failed', name)
+
+    def enqueue(self, name, **kwargs):
+      #Queues the job called name. When the queue is full the job runs right
+      # away in the caller, so back pressure slows writes instead of losing work
+      if name not in registry:
+          raise KeyError('unknown job {}'.format(name))
+      job = Job(name, kwargs)
+      self.ensure_started()
+      try:
+          self.queue.put(job)
+      except queue.Full:
+          self.stats.increment('overflow')
+          self.run_inline(job)
+          return
+      self.stats.increment('enqueued')
+
+    def run_inline(self, job):
+      #Runs the job once in the caller, logging instead of raising its error
+      #Output = True when the job succeeded
+      try:
+          registry[job.name](**job.kwargs)
+      except Exception:
+          logger.exception('job %s failed', job.name)
+          self.stats.increment('failed')
+          return False
+      return True
+
+    def work(self):
+      while True:
+          with self.app.app_context():
+              job = self.queue.get(timeout=self.poll_interval)
+              if job is not None:
+                  self.execute(job)
+
+    def execute(self, job):
+      started = time.time()
+      try:
+          registry[job.name](**job.kwargs)
+          self.queue.done(job)
+      except Exception as error:
+          job.attempts += 1
+          if job.attempts >= self.max_attempts:
+              logger.exception('job %s failed after %d attempts', job.name, job.attempts)
+              self.queue.fail(job, error)
+              self.stats.increment('failed')
+          else:
+              delay = min(self.retry_delay * 2 ** (job.attempts - 1), self.retry_max_delay)
+              logger.warning('job %s failed (%s), retrying in %.1fs', job.name, error, delay)
+              self.queue.retry(job, delay, error)
+              self.stats.increment('retried')
+          return
+      self.stats.record(started - job.enqueued_at, time.time() - started)
+
+    def snapshot(self):
+      #Output = dict of the queue depth and the counters of this process
+      data = dict(
+          backend=self.queue.__class__.__name__,
+          workers=self.workers,
+          alive=sum(thread.is_alive() for thread in self.threads) if self.pid == os.getpid() else 0,
+          depth=self.queue.depth(),
+      )
+      data.update(self.stats.snapshot())
+      return data
+
+class InlineRunner(JobRunner):
+    #Runs every job in the caller, e.g. for tests and CLI commands. Nothing
+    # runs on a schedule
+    def ensure_started(self):
+      pass
+
+    def enqueue(self, name, **kwargs):
+      if name not in registry:
+          raise KeyError('unknown job {}'.format(name))
+      self.stats.increment('enqueued')
+      job = Job(name, kwargs)
+      if self.run_inline(job):
+          self.stats.record(0.0, time.time() - job.enqueued_at)
+
+def init_jobs(app):
+    #Builds the job runner selected by JOBS_BACKEND: 'thread' (in-process
+    # queue), 'postgres' (the job table) or 'inline' (no queue)
+    config = app.config
+    options = dict(
+        workers=config['JOBS_WORKERS'],
+        max_attempts=config['JOBS_MAX_ATTEMPTS'],
+        retry_delay=config['JOBS_RETRY_DELAY'],
+        retry_max_delay=config['JOBS_RETRY_MAX_DELAY'],
+        poll_interval=config['JOBS_POLL_INTERVAL'],
+    )
+    if config['JOBS_BACKEND'] == 'inline':
+        runner = InlineRunner(app, MemoryQueue(0), **options)
+    elif config['JOBS_BACKEND'] == 'postgres':
+        runner = JobRunner(app, PostgresQueue(config['JOBS_QUEUE_SIZE'], config['JOBS_POLL_INTERVAL']), **options)
+    else:
+        runner = JobRunner(app, MemoryQueue(config['JOBS_QUEUE_SIZE']), **options)
+    # Every process polls the job table and runs its schedules, not only
+    # those that enqueue
+    app.before_request(runner.ensure_started)
+    app.extensions['jobs'] = runner
+    return runner
@@ -0,0 +1,45 @@
+"""venue_stats and artist_stats show counts
+
+Revision ID: 0b6c7e229bae
+Revises: 806803fbc47f
+Create Date: 2026-10-18 17:12:30.581946
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0b6c7e229bae'
+down_revision = '806803fbc47f'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    for table in ('venue', 'artist'):
+        op.create_table('{}_stats'.format(table),
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('upcoming_shows_count', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('past_shows_count', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('next_show_at', sa.DateTime(timezone=True), nullable=True),
+        sa.ForeignKeyConstraint(['id'], ['{}.id'.format(table)], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id')
+        )
+        op.create_index('ix_{}_stats_next_show_at'.format(table), '{}_stats'.format(table),
+                        ['next_show_at'], unique=False)
+        op.execute(
+            'INSERT INTO {0}_stats (id, upcoming_shows_count, past_shows_count, next_show_at) '
+            'SELECT {0}.id, '
+            'count(show.id) FILTER (WHERE show.start_time > now()), '
+            'count(show.id) FILTER (WHERE show.start_time <= now()), '
+            'min(show.start_time) FILTER (WHERE show.start_time > now()) '
+            'FROM {0} LEFT OUTER JOIN show ON show.{0}_id = {0}.id '
+            'GROUP BY {0}.id'.format(table)
+        )
+
+
+def downgrade():
+    for table in ('artist', 'venue'):
+        op.drop_index('ix_{}_stats_next_show_at'.format(table), table_name='{}_stats'.format(table))
+        op.drop_table('{}_stats'.format(table))
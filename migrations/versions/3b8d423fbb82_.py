@@ -0,0 +1,36 @@
+"""show start_time as timestamp with time zone, indexed per venue and artist
+
+Revision ID: 3b8d423fbb82
+Revises: f1d2ecc25e65
+Create Date: 2026-10-18 09:12:41.204117
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3b8d423fbb82'
+down_revision = 'f1d2ecc25e65'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.alter_column('show', 'start_time',
+               existing_type=sa.String(),
+               type_=sa.TIMESTAMP(timezone=True),
+               postgresql_using='start_time::timestamp with time zone',
+               existing_nullable=True)
+    op.create_index('ix_show_venue_id_start_time', 'show', ['venue_id', 'start_time'], unique=False)
+    op.create_index('ix_show_artist_id_start_time', 'show', ['artist_id', 'start_time'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_show_artist_id_start_time', table_name='show')
+    op.drop_index('ix_show_venue_id_start_time', table_name='show')
+    op.alter_column('show', 'start_time',
+               existing_type=sa.TIMESTAMP(timezone=True),
+               type_=sa.String(),
+               postgresql_using="to_char(start_time, 'YYYY-MM-DD HH24:MI:SS')",
+               existing_nullable=True)
@@ -0,0 +1,29 @@
+"""updated_at on venue and artist
+
+Revision ID: 5f36eb914aa9
+Revises: c674df50a7e7
+Create Date: 2026-10-18 13:02:41.118305
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5f36eb914aa9'
+down_revision = 'c674df50a7e7'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    for table in ('venue', 'artist'):
+        op.add_column(table, sa.Column('updated_at', sa.DateTime(timezone=True),
+                   server_default=sa.text('now()'), nullable=False))
+        op.create_index('ix_{}_updated_at'.format(table), table, ['updated_at'], unique=False)
+
+
+def downgrade():
+    for table in ('artist', 'venue'):
+        op.drop_index('ix_{}_updated_at'.format(table), table_name=table)
+        op.drop_column(table, 'updated_at')
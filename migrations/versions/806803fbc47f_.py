@@ -0,0 +1,29 @@
+"""covering indexes of the /artists sort orders
+
+Revision ID: 806803fbc47f
+Revises: 47a7910ba440
+Create Date: 2026-10-18 16:04:52.617340
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '806803fbc47f'
+down_revision = '47a7910ba440'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_artist_name_id', 'artist', ['name', 'id'], unique=False)
+    op.create_index('ix_artist_city_name_id', 'artist', ['city', 'name', 'id'], unique=False)
+    # INCLUDE needs PostgreSQL 11
+    op.create_index('ix_artist_id_name', 'artist', ['id'], unique=False, postgresql_include=['name'])
+
+
+def downgrade():
+    op.drop_index('ix_artist_id_name', table_name='artist')
+    op.drop_index('ix_artist_city_name_id', table_name='artist')
+    op.drop_index('ix_artist_name_id', table_name='artist')
@@ -0,0 +1,38 @@
+"""pg_trgm and genre indexes for venue and artist search
+
+Revision ID: c674df50a7e7
+Revises: db23f9e4ddb1
+Create Date: 2026-10-18 11:26:52.910448
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c674df50a7e7'
+down_revision = 'db23f9e4ddb1'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for table in ('venue', 'artist'):
+        op.create_index('ix_{}_name_trgm'.format(table), table, ['name'], unique=False,
+                   postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'})
+        op.create_index('ix_{}_city_trgm'.format(table), table, ['city'], unique=False,
+                   postgresql_using='gin', postgresql_ops={'city': 'gin_trgm_ops'})
+        op.create_index('ix_{}_genres'.format(table), table, ['genres'], unique=False,
+                   postgresql_using='gin')
+    op.create_index('ix_venue_state_city', 'venue', ['state', 'city'], unique=False)
+    op.create_index('ix_artist_state', 'artist', ['state'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_artist_state', table_name='artist')
+    op.drop_index('ix_venue_state_city', table_name='venue')
+    for table in ('artist', 'venue'):
+        op.drop_index('ix_{}_genres'.format(table), table_name=table)
+        op.drop_index('ix_{}_city_trgm'.format(table), table_name=table)
+        op.drop_index('ix_{}_name_trgm'.format(table), table_name=table)
@@ -0,0 +1,46 @@
+"""surrogate primary key on show
+
+show.start_time becomes NOT NULL. The old show form could save shows
+without a start time; those rows are deleted first, since there is no
+time to backfill them with and they never showed up as past or upcoming.
+
+Revision ID: db23f9e4ddb1
+Revises: 3b8d423fbb82
+Create Date: 2026-10-18 10:03:17.588320
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'db23f9e4ddb1'
+down_revision = '3b8d423fbb82'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.drop_constraint('show_pkey', 'show', type_='primary')
+    op.execute('ALTER TABLE show ADD COLUMN id SERIAL')
+    op.create_primary_key('show_pkey', 'show', ['id'])
+    op.execute('DELETE FROM show WHERE start_time IS NULL')
+    op.alter_column('show', 'start_time',
+               existing_type=sa.TIMESTAMP(timezone=True),
+               nullable=False)
+    op.create_index('ix_show_start_time_id', 'show', ['start_time', 'id'], unique=False)
+
+
+def downgrade():
+    # Only one show per (venue, artist) pair survives the old composite key
+    op.execute(
+        'DELETE FROM show s USING show t '
+        'WHERE s.venue_id = t.venue_id AND s.artist_id = t.artist_id AND s.id < t.id'
+    )
+    op.drop_index('ix_show_start_time_id', table_name='show')
+    op.alter_column('show', 'start_time',
+               existing_type=sa.TIMESTAMP(timezone=True),
+               nullable=True)
+    op.drop_constraint('show_pkey', 'show', type_='primary')
+    op.drop_column('show', 'id')
+    op.create_primary_key('show_pkey', 'show', ['venue_id', 'artist_id'])
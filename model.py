@@ -1,123 +1,304 @@
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import List, Optional
+
 from flask_sqlalchemy import SQLAlchemy
 
 db = SQLAlchemy()
 
+def utcnow():
+    return datetime.now(timezone.utc)
+
 #----------------------------------------------------------------------------#
 # Models.
 #----------------------------------------------------------------------------#
 
-Show = db.Table('show',
-    db.Column('venue_id', db.Integer, db.ForeignKey('venue.id'), primary_key=True),
-    db.Column('artist_id', db.Integer, db.ForeignKey('artist.id'), primary_key=True),
-    db.Column('start_time', db.String)
-)
-
 class Venue(db.Model):
     __tablename__ = 'venue'
+    __table_args__ = (
+        db.Index('ix_venue_name_trgm', 'name', postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'}),
+        db.Index('ix_venue_city_trgm', 'city', postgresql_using='gin', postgresql_ops={'city': 'gin_trgm_ops'}),
+        db.Index('ix_venue_state_city', 'state', 'city'),
+        db.Index('ix_venue_genres', 'genres', postgresql_using='gin'),
+        db.Index('ix_venue_updated_at', 'updated_at'),
+    )
 
+    # The large columns are deferred, queries pick what they load by a
+    # profile of LOAD_PROFILES below
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String, nullable=False)
     city = db.Column(db.String(120), nullable=False)
     state = db.Column(db.String(120), nullable=False)
     address = db.Column(db.String(120), nullable=False)
     phone = db.Column(db.String(120))
-    genres = db.Column(db.ARRAY(db.String), nullable=False)
-    image_link = db.Column(db.String(500))
-    facebook_link = db.Column(db.String(120))
-    website_link = db.Column(db.String(120))
+    genres = db.deferred(db.Column(db.ARRAY(db.String), nullable=False), group='detail')
+    image_link = db.deferred(db.Column(db.String(500)), group='detail')
+    facebook_link = db.deferred(db.Column(db.String(120)), group='detail')
+    website_link = db.deferred(db.Column(db.String(120)), group='detail')
     seeking_talent = db.Column(db.Boolean , default = False)
-    seeking_description = db.Column(db.String(200))
-    artists = db.relationship('Artist', secondary=Show, backref=db.backref('venues', lazy=True))
+    seeking_description = db.deferred(db.Column(db.String(200)), group='detail')
+    # Bumped whenever the venue page changes, it drives the page's ETag
+    updated_at = db.Column(db.DateTime(timezone=True), nullable=False, default=utcnow, server_default=db.func.now())
+    artists = db.relationship('Artist', secondary='show', viewonly=True, backref=db.backref('venues', lazy=True, viewonly=True))
 
     def __repr__(self):
       return f'<Venue: {self.id} - {self.name} at {self.city},{self.state}>'
 
 class Artist(db.Model):
     __tablename__ = 'artist'
+    __table_args__ = (
+        db.Index('ix_artist_name_trgm', 'name', postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'}),
+        db.Index('ix_artist_city_trgm', 'city', postgresql_using='gin', postgresql_ops={'city': 'gin_trgm_ops'}),
+        db.Index('ix_artist_state', 'state'),
+        db.Index('ix_artist_genres', 'genres', postgresql_using='gin'),
+        db.Index('ix_artist_updated_at', 'updated_at'),
+        # Covering indexes of the /artists sort orders
+        db.Index('ix_artist_name_id', 'name', 'id'),
+        db.Index('ix_artist_city_name_id', 'city', 'name', 'id'),
+        db.Index('ix_artist_id_name', 'id', postgresql_include=['name']),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String, nullable=False)
     city = db.Column(db.String(120), nullable=False)
     state = db.Column(db.String(120), nullable=False)
     phone = db.Column(db.String(120))
-    genres = db.Column(db.ARRAY(db.String), nullable=False)
-    image_link = db.Column(db.String(500))
-    facebook_link = db.Column(db.String(120))
-    website_link = db.Column(db.String(120))
+    genres = db.deferred(db.Column(db.ARRAY(db.String), nullable=False), group='detail')
+    image_link = db.deferred(db.Column(db.String(500)), group='detail')
+    facebook_link = db.deferred(db.Column(db.String(120)), group='detail')
+    website_link = db.deferred(db.Column(db.String(120)), group='detail')
     seeking_venue = db.Column(db.Boolean , default = False)
-    seeking_description = db.Column(db.String(200))
+    seeking_description = db.deferred(db.Column(db.String(200)), group='detail')
+    # Bumped whenever the artist page changes, it drives the page's ETag
+    updated_at = db.Column(db.DateTime(timezone=True), nullable=False, default=utcnow, server_default=db.func.now())
 
     def __repr__(self):
       return f'<Artist: {self.id} - {self.name} from {self.city},{self.state}>'
 
+class Show(db.Model):
+    __tablename__ = 'show'
+    __table_args__ = (
+        db.Index('ix_show_venue_id_start_time', 'venue_id', 'start_time'),
+        db.Index('ix_show_artist_id_start_time', 'artist_id', 'start_time'),
+        db.Index('ix_show_start_time_id', 'start_time', 'id'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    venue_id = db.Column(db.Integer, db.ForeignKey('venue.id'), nullable=False)
+    artist_id = db.Column(db.Integer, db.ForeignKey('artist.id'), nullable=False)
+    start_time = db.Column(db.DateTime(timezone=True), nullable=False)
+    venue = db.relationship('Venue', backref=db.backref('shows', lazy=True))
+    artist = db.relationship('Artist', backref=db.backref('shows', lazy=True))
+
+    def __repr__(self):
+      return f'<Show: {self.id} - artist {self.artist_id} at venue {self.venue_id} on {self.start_time}>'
+
+class VenueStats(db.Model):
+    #Show counts of a venue, kept by stats.py
+    __tablename__ = 'venue_stats'
+    __table_args__ = (
+        db.Index('ix_venue_stats_next_show_at', 'next_show_at'),
+    )
+
+    id = db.Column(db.Integer, db.ForeignKey('venue.id', ondelete='CASCADE'), primary_key=True)
+    upcoming_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    past_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    # Start of the next upcoming show, the counts are exact until then
+    next_show_at = db.Column(db.DateTime(timezone=True))
+
+class ArtistStats(db.Model):
+    #Show counts of an artist, kept by stats.py
+    __tablename__ = 'artist_stats'
+    __table_args__ = (
+        db.Index('ix_artist_stats_next_show_at', 'next_show_at'),
+    )
+
+    id = db.Column(db.Integer, db.ForeignKey('artist.id', ondelete='CASCADE'), primary_key=True)
+    upcoming_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    past_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    next_show_at = db.Column(db.DateTime(timezone=True))
+
+class QueuedJob(db.Model):
+    #A background job of the postgres job backend, see jobs.py
+    __tablename__ = 'job'
+    __table_args__ = (
+        db.Index('ix_job_run_at_id', 'run_at', 'id', postgresql_where=db.text('failed_at IS NULL')),
+    )
+
+    id = db.Column(db.BigInteger().with_variant(db.Integer, 'sqlite'), primary_key=True)
+    name = db.Column(db.String(120), nullable=False)
+    args = db.Column(db.JSON, nullable=False)
+    attempts = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    run_at = db.Column(db.DateTime(timezone=True), nullable=False, default=utcnow, server_default=db.func.now())
+    created_at = db.Column(db.DateTime(timezone=True), nullable=False, default=utcnow, server_default=db.func.now())
+    failed_at = db.Column(db.DateTime(timezone=True))
+    last_error = db.Column(db.Text)
+
+    def __repr__(self):
+      return f'<QueuedJob: {self.id} - {self.name} attempt {self.attempts}>'
+
+#----------------------------------------------------------------------------#
+# Load profiles.
+#----------------------------------------------------------------------------#
+
+# Columns read by each kind of page:
+#   listing   - rows of the /venues and /artists listings
+#   tile      - image tiles of the shows on venue and artist pages
+#   detail    - venue and artist detail pages
+#   edit-form - the edit and delete forms
+VENUE_DETAIL = ('id', 'name', 'city', 'state', 'address', 'phone', 'genres', 'image_link',
+                'facebook_link', 'website_link', 'seeking_talent', 'seeking_description')
+ARTIST_DETAIL = ('id', 'name', 'city', 'state', 'phone', 'genres', 'image_link',
+                 'facebook_link', 'website_link', 'seeking_venue', 'seeking_description')
+
+LOAD_PROFILES = {
+    Venue: {
+        'listing': ('id', 'name', 'city', 'state', 'updated_at'),
+        'tile': ('id', 'name', 'image_link', 'updated_at'),
+        'detail': VENUE_DETAIL,
+        'edit-form': VENUE_DETAIL,
+    },
+    Artist: {
+        'listing': ('id', 'name'),
+        'tile': ('id', 'name', 'image_link', 'updated_at'),
+        'detail': ARTIST_DETAIL,
+        'edit-form': ARTIST_DETAIL,
+    },
+}
+
+def profile_columns(model, profile):
+    #Output = the column attributes of a load profile, for column queries and
+    # select()
+    return [getattr(model, name) for name in LOAD_PROFILES[model][profile]]
+
+def load_profile(model, profile):
+    #Output = query option loading exactly the columns of a load profile into
+    # model objects, deferred or not
+    return db.load_only(*LOAD_PROFILES[model][profile])
+
+#----------------------------------------------------------------------------#
+# Response records.
+#----------------------------------------------------------------------------#
+
+# Plain records handed to the templates and the JSON API. slots=True keeps
+# them free of a per-instance __dict__, the JSON encoder serializes them as is
+
+@dataclass(slots=True)
 class Area:
-    def __init__(self, city, state,venues):
-      self.city = city
-      self.state = state
-      self.venues = venues
+    city: str
+    state: str
+    venues: list
+
+    @property
+    def version(self):
+      #Changes whenever a venue of the area is added, edited or deleted
+      return (len(self.venues), max(venue.updated_at for venue in self.venues))
+
+@dataclass(slots=True)
+class SearchResult:
+    id: int
+    name: str
 
+@dataclass(slots=True)
 class SearchResponse:
-    def __init__(self, count, data):
-      self.count = count
-      self.data = data
+    count: int
+    data: list
+    page: Optional[int] = None
+    per_page: Optional[int] = None
+    elapsed: Optional[float] = None
 
-class VenueResponse:
-    def __init__(self, id, name,city,state, address,phone,genres, image_link,facebook_link,website,seeking_talent,seeking_description,upcoming_shows_count,upcoming_shows,past_shows_count,past_shows):
-        self.id = id
-        self.name = name
-        self.city = city
-        self.state = state
-        self.address = address
-        self.phone = phone
-        self.genres = genres
-        self.image_link = image_link
-        self.facebook_link = facebook_link
-        self.website = website
-        self.seeking_talent = seeking_talent
-        self.seeking_description = seeking_description
-        self.upcoming_shows_count = upcoming_shows_count
-        self.upcoming_shows = upcoming_shows
-        self.past_shows_count = past_shows_count
-        self.past_shows = past_shows
+    @property
+    def has_next(self):
+      return self.page is not None and self.page * self.per_page < self.count
+
+@dataclass(slots=True)
+class BrowseResponse:
+    count: int
+    genres: dict
+    states: dict
+    data: list
+    page: int
+    per_page: int
+
+    @property
+    def has_next(self):
+      return self.page * self.per_page < self.count
 
+@dataclass(slots=True)
 class VenueShowResponse:
-    def __init__(self, artist_image_link, artist_id,artist_name,start_time):
-        self.artist_image_link = artist_image_link
-        self.artist_id = artist_id
-        self.artist_name = artist_name
-        self.start_time = start_time
+    artist_image_link: Optional[str]
+    artist_id: int
+    artist_name: str
+    start_time: datetime
+    artist_updated_at: Optional[datetime] = None
 
-class ArtistResponse:
-    def __init__(self, id, name,city,state,phone,genres, image_link,facebook_link,website,
-    seeking_venue,seeking_description,upcoming_shows_count,upcoming_shows,past_shows_count,past_shows):
-      self.id = id
-      self.name = name
-      self.city = city
-      self.state = state
-      self.phone = phone
-      self.genres = genres
-      self.image_link = image_link
-      self.facebook_link = facebook_link
-      self.website = website
-      self.seeking_venue = seeking_venue
-      self.seeking_description = seeking_description
-      self.upcoming_shows_count = upcoming_shows_count
-      self.upcoming_shows = upcoming_shows
-      self.past_shows_count = past_shows_count
-      self.past_shows = past_shows
+@dataclass(slots=True)
+class VenueResponse:
+    id: int
+    name: str
+    city: str
+    state: str
+    address: str
+    phone: Optional[str]
+    genres: list
+    image_link: Optional[str]
+    facebook_link: Optional[str]
+    website: Optional[str]
+    seeking_talent: bool
+    seeking_description: Optional[str]
+    upcoming_shows_count: int
+    upcoming_shows: List[VenueShowResponse]
+    past_shows_count: int
+    past_shows: List[VenueShowResponse]
 
+@dataclass(slots=True)
 class ArtistShowResponse:
-    def __init__(self, venue_image_link, venue_id,venue_name,start_time):
-      self.venue_image_link = venue_image_link
-      self.venue_id = venue_id
-      self.venue_name = venue_name
-      self.start_time = start_time
+    venue_image_link: Optional[str]
+    venue_id: int
+    venue_name: str
+    start_time: datetime
+    venue_updated_at: Optional[datetime] = None
+
+@dataclass(slots=True)
+class ArtistResponse:
+    id: int
+    name: str
+    city: str
+    state: str
+    phone: Optional[str]
+    genres: list
+    image_link: Optional[str]
+    facebook_link: Optional[str]
+    website: Optional[str]
+    seeking_venue: bool
+    seeking_description: Optional[str]
+    upcoming_shows_count: int
+    upcoming_shows: List[ArtistShowResponse]
+    past_shows_count: int
+    past_shows: List[ArtistShowResponse]
+
+@dataclass(slots=True)
+class HomeFeed:
+    upcoming_shows: List['Shows']
+    venues: list
+    artists: list
+    built_at: datetime
+
+    def upcoming(self, now):
+      #The shows of the snapshot that have not started by now. SQLite returns
+      # naive datetimes, which are UTC
+      return [
+          show for show in self.upcoming_shows
+          if (show.start_time.tzinfo and show.start_time or show.start_time.replace(tzinfo=timezone.utc)) > now
+      ]
 
+@dataclass(slots=True)
 class Shows:
-    def __init__(self, venue_id, venue_name, artist_id, artist_name, artist_image_link, start_time):
-      self.venue_id = venue_id
-      self.venue_name = venue_name
-      self.artist_id = artist_id
-      self.artist_name = artist_name
-      self.artist_image_link = artist_image_link
-      self.start_time = start_time
\ No newline at end of file
+    venue_id: int
+    venue_name: str
+    artist_id: int
+    artist_name: str
+    artist_image_link: Optional[str]
+    start_time: datetime
+    venue_updated_at: Optional[datetime] = None
+    artist_updated_at: Optional[datetime] = None
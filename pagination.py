@@ -0,0 +1,111 @@
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from datetime import datetime
+
+from model import Artist, ArtistStats, db, profile_columns
+
+#----------------------------------------------------------------------------#
+# Keyset pagination.
+#----------------------------------------------------------------------------#
+
+def encode_cursor(values):
+    #Encodes the sort key of the last row of a page as an opaque url-safe string
+    data = [value.isoformat() if isinstance(value, datetime) else value for value in values]
+    return urlsafe_b64encode(json.dumps(data).encode()).decode()
+
+def decode_cursor(cursor, columns):
+    #Decodes a cursor back into values typed like the sort columns
+    #Raises ValueError when the cursor is malformed
+    try:
+        data = json.loads(urlsafe_b64decode(cursor.encode()))
+    except (TypeError, ValueError) as error:
+        raise ValueError('invalid cursor') from error
+    if not isinstance(data, list) or len(data) != len(columns):
+        raise ValueError('invalid cursor')
+    return [cursor_value(column, value) for column, value in zip(columns, data)]
+
+def cursor_value(column, value):
+    #Output = value of a decoded cursor converted to the type of column
+    #Raises ValueError when value does not fit the column, so a forged cursor
+    # never reaches the query
+    python_type = column.type.python_type
+    if python_type is datetime:
+        if not isinstance(value, str):
+            raise ValueError('invalid cursor')
+        return datetime.fromisoformat(value)
+    # bool is an int, but never a valid key
+    if not isinstance(value, python_type) or isinstance(value, bool):
+        raise ValueError('invalid cursor')
+    return value
+
+class KeysetPage:
+    #Iterates one page of rows fetched with limit(per_page + 1); the extra row
+    # only tells whether there is a next page. next_cursor is set when the
+    # iteration reaches the end of the page, so a streamed template can render
+    # the "next" link after the rows.
+    def __init__(self, rows, per_page, key, wrap=None):
+      self.rows = rows
+      self.per_page = per_page
+      self.key = key
+      self.wrap = wrap
+      self.next_cursor = None
+
+    def __iter__(self):
+      last = None
+      for count, row in enumerate(self.rows):
+          if count == self.per_page:
+              self.next_cursor = encode_cursor(self.key(last))
+              return
+          last = row
+          yield self.wrap(row) if self.wrap else row
+
+def keyset_query(query, columns, cursor=None, per_page=50, descending=False):
+    #Orders query, a Query or a select(), by columns and narrows it to the page
+    # after cursor plus one row
+    #Raises ValueError when the cursor is malformed
+    key = db.tuple_(*columns)
+    if cursor:
+        after = db.tuple_(*decode_cursor(cursor, columns))
+        query = query.filter(key < after if descending else key > after)
+    order = [column.desc() for column in columns] if descending else list(columns)
+    return query.order_by(*order).limit(per_page + 1)
+
+def row_key(columns):
+    #Output = function reading the values of columns from a result row
+    names = [column.key for column in columns]
+    return lambda row: [getattr(row, name) for name in names]
+
+def keyset_page(query, columns, cursor=None, per_page=50, wrap=None, descending=False):
+    #Orders query by columns and returns the page of rows after cursor
+    #Raises ValueError when the cursor is malformed
+    rows = keyset_query(query, columns, cursor, per_page, descending)
+    return KeysetPage(rows, per_page, key=row_key(columns), wrap=wrap)
+
+#----------------------------------------------------------------------------#
+# Artist directory.
+#----------------------------------------------------------------------------#
+
+# Sort orders of /artists: (sort key columns, descending). Each has a covering
+# index, so a page is read from the index alone whatever the table size
+ARTIST_SORTS = {
+    'name': ((Artist.name, Artist.id), False),
+    'city': ((Artist.city, Artist.name, Artist.id), False),
+    'recent': ((Artist.id,), True),
+}
+
+def artist_directory(sort, cursor=None, per_page=50):
+    #Builds the select() of one page of the artist directory, loading only the
+    # listing profile, the sort key and the upcoming show count
+    #Output = (statement, sort key columns)
+    #Raises ValueError when sort is unknown or the cursor is malformed
+    if sort not in ARTIST_SORTS:
+        raise ValueError('unknown sort')
+    columns, descending = ARTIST_SORTS[sort]
+    statement = (
+        db.select(
+            *dict.fromkeys(profile_columns(Artist, 'listing') + list(columns)),
+            db.func.coalesce(ArtistStats.upcoming_shows_count, 0).label('upcoming_shows_count'),
+        )
+        .outerjoin(ArtistStats, ArtistStats.id == Artist.id)
+    )
+    return keyset_query(statement, columns, cursor, per_page, descending), columns
@@ -0,0 +1,75 @@
+import time
+
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+#----------------------------------------------------------------------------#
+# Per-request SQL statistics.
+#----------------------------------------------------------------------------#
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    # The start time goes on the statement's own execution context, so a
+    # statement that raises leaves nothing behind to pair with the next one.
+    # The few cursor executions without a context overwrite a single slot
+    if context is not None:
+        context._query_start = time.perf_counter()
+    else:
+        conn.info['query_start'] = time.perf_counter()
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    start = context._query_start if context is not None else conn.info.pop('query_start')
+    if has_request_context() and 'queries' in g:
+        g.queries.append((time.perf_counter() - start, statement))
+
+def init_query_log(app):
+    #Records the statements each request runs and logs one line per request
+    # with its query count, DB time and slowest statement. Requests slower
+    # than SLOW_REQUEST_MS also log every statement they ran. The timings are
+    # sent to the browser as a Server-Timing header
+    def log_request(method, path, status, queries, total_ms):
+        #Output = DB time of queries in ms
+        db_ms = sum(elapsed for elapsed, statement in queries) * 1000
+        slowest_ms, slowest = max(queries, default=(0.0, ''))
+        app.logger.info(
+            'request method=%s path=%s status=%d queries=%d db_ms=%.1f total_ms=%.1f slowest_ms=%.1f slowest=%r',
+            method, path, status, len(queries),
+            db_ms, total_ms, slowest_ms * 1000, ' '.join(slowest.split())[:200],
+        )
+        if total_ms >= app.config['SLOW_REQUEST_MS']:
+            app.logger.warning(
+                'slow request method=%s path=%s total_ms=%.1f\n%s',
+                method, path, total_ms,
+                '\n'.join('%.1fms %s' % (elapsed * 1000, statement) for elapsed, statement in queries),
+            )
+        return db_ms
+
+    @app.before_request
+    def start_query_log():
+        g.queries = []
+        g.request_start = time.perf_counter()
+
+    @app.after_request
+    def finish_query_log(response):
+        if 'queries' not in g:
+            return response
+        if response.is_streamed:
+            # A streamed body runs its queries after this hook, while it is
+            # sent, so the request is logged once the server closed it. Its
+            # headers are already gone by then, it gets no Server-Timing
+            queries, start = g.queries, g.request_start
+            method, path, status = request.method, request.path, response.status_code
+            response.call_on_close(
+                lambda: log_request(method, path, status, queries, (time.perf_counter() - start) * 1000)
+            )
+            return response
+        total_ms = (time.perf_counter() - g.request_start) * 1000
+        db_ms = log_request(request.method, request.path, response.status_code, g.queries, total_ms)
+        if app.config['SERVER_TIMING']:
+            response.headers.add(
+                'Server-Timing', 'db;dur=%.1f;desc="%d queries"' % (db_ms, len(g.queries))
+            )
+            response.headers.add('Server-Timing', 'app;dur=%.1f' % total_ms)
+        return response
@@ -0,0 +1,247 @@
+import heapq
+import logging
+import re
+import time
+
+from enumfile import Genre
+from model import db, Artist, BrowseResponse, SearchResponse, SearchResult, Venue
+
+logger = logging.getLogger(__name__)
+
+#----------------------------------------------------------------------------#
+# Search.
+#----------------------------------------------------------------------------#
+
+# Search terms are matched against genres by enum name or value, since forms
+# store the choice name ('Hip_Hop') while seeded data may use the value
+GENRES = {}
+for genre in Genre:
+    GENRES[genre.name.lower()] = [genre.name, genre.value]
+    GENRES[genre.value.lower()] = [genre.name, genre.value]
+
+WORD = re.compile(r'[^\W_]+')
+
+def trigrams(text):
+    #Splits text into the same set of trigrams pg_trgm would
+    grams = set()
+    for word in WORD.findall(text.lower()):
+        padded = '  ' + word + ' '
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+def similarity(text, term):
+    #Python equivalent of pg_trgm's similarity()
+    a, b = trigrams(text), trigrams(term)
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+def canonical_genre(genre):
+    #Output = the enum name of a stored genre, or the genre as is when unknown
+    return GENRES[genre.lower()][0] if genre.lower() in GENRES else genre
+
+def canonical_genre_expression(genre):
+    #SQL equivalent of canonical_genre()
+    return db.case(
+        {key: names[0] for key, names in GENRES.items()},
+        value=db.func.lower(genre),
+        else_=genre,
+    )
+
+def genre_condition(model, genre):
+    #genres is a generic ARRAY, which has no overlap(); the cast keeps both
+    # sides varchar[] so the GIN index applies
+    return model.genres.op('&&')(db.cast(GENRES[genre.lower()], model.genres.type))
+
+def escape_like(term):
+    return term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+def search(model, term, per_page, page=None):
+    #Runs a venue or artist search and builds its SearchResponse in one DB trip,
+    # two for a page past the last one
+    #Input = Venue or Artist model, search term, results per page and the
+    # 1-based page number; without a page only the best per_page matches are
+    # returned and counted
+    #Output = SearchResponse with a SearchResult (id and name) per match
+    term = (term or '').strip()
+    if page is not None:
+        page = max(page, 1)
+    offset = (page - 1) * per_page if page else 0
+    start = time.perf_counter()
+    if db.engine.dialect.name == 'postgresql':
+        data, count = search_postgresql(model, term, per_page, offset, paginated=page is not None)
+    else:
+        data, count = search_python(model, term, per_page, offset, paginated=page is not None)
+    elapsed = time.perf_counter() - start
+    logger.info('search %s %r: %d results in %.1fms', model.__tablename__, term, count, elapsed * 1000)
+    data = [SearchResult(row.id, row.name) for row in data]
+    return SearchResponse(count=count, data=data, page=page, per_page=per_page, elapsed=elapsed)
+
+def search_postgresql(model, term, limit, offset, paginated):
+    data = db.session.execute(search_statement(model, term, limit, offset, paginated)).all()
+    count = result_count(data, paginated)
+    if count is None:
+        count = db.session.execute(count_statement(model, term)).scalar()
+    return data, count
+
+def search_conditions(model, term):
+    #The ILIKE conditions are served by the pg_trgm GIN indexes and the genre
+    # overlap by the GIN index on the genres array
+    pattern = '%{}%'.format(escape_like(term))
+    conditions = [
+        model.name.ilike(pattern, escape='\\'),
+        model.city.ilike(pattern, escape='\\'),
+        model.state == term.upper(),
+    ]
+    if term.lower() in GENRES:
+        conditions.append(genre_condition(model, term))
+    return db.or_(*conditions)
+
+def search_statement(model, term, limit, offset, paginated):
+    #When paginated the total number of matches comes back with every row as
+    # count(*) OVER ()
+    columns = [model.id, model.name]
+    if paginated:
+        columns.append(db.func.count().over().label('total'))
+    return (
+        db.select(*columns)
+        .where(search_conditions(model, term))
+        .order_by(db.func.similarity(model.name, term).desc(), model.name, model.id)
+        .offset(offset)
+        .limit(limit)
+    )
+
+def count_statement(model, term):
+    #Counts the matches of a search on its own, for pages past the last one
+    return db.select(db.func.count()).select_from(model).where(search_conditions(model, term))
+
+def result_count(data, paginated):
+    #Output = number of matches of a search_statement result, or None when a
+    # paginated page is empty: past the last page there is no row to read the
+    # total from, and the caller runs count_statement
+    if not paginated:
+        return len(data)
+    return data[0].total if data else None
+
+def search_python(model, term, limit, offset, paginated):
+    #In-process fallback for databases without pg_trgm (e.g. SQLite in tests),
+    # matching and ranking rows exactly like search_postgresql
+    needle = term.lower()
+    genres = set(GENRES.get(needle, ()))
+    rows = db.session.query(model.id, model.name, model.city, model.state, model.genres).yield_per(1000)
+    matches = [
+        row for row in rows
+        if needle in row.name.lower()
+        or needle in row.city.lower()
+        or row.state == term.upper()
+        or genres.intersection(row.genres or ())
+    ]
+    ranked = heapq.nsmallest(
+        offset + limit, matches, key=lambda row: (-similarity(row.name, term), row.name, row.id)
+    )
+    data = ranked[offset:]
+    return data, len(matches) if paginated else len(data)
+
+#----------------------------------------------------------------------------#
+# Faceted browse.
+#----------------------------------------------------------------------------#
+
+# Column of the "seeking" filter of each model
+SEEKING = {Venue: 'seeking_talent', Artist: 'seeking_venue'}
+
+def browse(model, per_page, page=1, state=None, genre=None, seeking=None):
+    #Lists the venues or artists matching every given filter, by name, with
+    # the number of matches per genre and per state
+    #Input = Venue or Artist model, results per page, 1-based page number and
+    # the filters: state code, genre by enum name or value, seeking flag
+    #Output = BrowseResponse, genres keyed by enum name
+    #Raises ValueError when genre is unknown
+    if genre and genre.lower() not in GENRES:
+        raise ValueError('unknown genre')
+    page = max(page, 1)
+    offset = (page - 1) * per_page
+    state = state.upper() if state else None
+    if db.engine.dialect.name == 'postgresql':
+        data, count, genres, states = browse_postgresql(model, per_page, offset, state, genre, seeking)
+    else:
+        data, count, genres, states = browse_python(model, per_page, offset, state, genre, seeking)
+    ranked = lambda counts: dict(sorted(counts.items(), key=lambda item: (-item[1], item[0])))
+    return BrowseResponse(
+        count=count,
+        genres=ranked(genres),
+        states=ranked(states),
+        data=[SearchResult(row.id, row.name) for row in data],
+        page=page,
+        per_page=per_page,
+    )
+
+def browse_postgresql(model, limit, offset, state, genre, seeking):
+    #The genre filter is served by the GIN index on genres. The counts per
+    # genre, per state and in total come from one aggregate over the matches,
+    # with a grouping set for each
+    conditions = []
+    if state:
+        conditions.append(model.state == state)
+    if genre:
+        conditions.append(genre_condition(model, genre))
+    if seeking is not None:
+        conditions.append(getattr(model, SEEKING[model]) == seeking)
+    data = db.session.execute(
+        db.select(model.id, model.name)
+        .where(*conditions)
+        .order_by(model.name, model.id)
+        .offset(offset)
+        .limit(limit)
+    ).all()
+    # Each genre is canonicalized before grouping, so a row storing a genre
+    # under both its name and its value counts once, like in browse_python
+    genre_column = db.func.unnest(model.genres).table_valued('genre').render_derived()
+    matches = (
+        db.select(model.id, model.state, canonical_genre_expression(genre_column.c.genre).label('genre'))
+        .select_from(model)
+        .outerjoin(genre_column, db.true())
+        .where(*conditions)
+        .subquery()
+    )
+    facets = db.session.execute(
+        db.select(
+            matches.c.genre,
+            matches.c.state,
+            db.func.grouping(matches.c.genre, matches.c.state).label('grouping'),
+            db.func.count(db.distinct(matches.c.id)).label('count'),
+        )
+        .group_by(db.func.grouping_sets(
+            db.tuple_(matches.c.genre), db.tuple_(matches.c.state), db.text('()'),
+        ))
+    )
+    count, genres, states = 0, {}, {}
+    for row in facets:
+        # grouping() has a bit set for each column the row is not grouped by
+        if row.grouping == 3:
+            count = row.count
+        elif row.grouping == 2:
+            states[row.state] = row.count
+        elif row.genre is not None:
+            genres[row.genre] = row.count
+    return data, count, genres, states
+
+def browse_python(model, limit, offset, state, genre, seeking):
+    #In-process fallback for databases without array support (e.g. SQLite in
+    # tests), filtering and counting rows exactly like browse_postgresql
+    wanted = set(GENRES[genre.lower()]) if genre else None
+    rows = db.session.query(
+        model.id, model.name, model.state, model.genres, getattr(model, SEEKING[model]).label('seeking'),
+    ).yield_per(1000)
+    matches = [
+        row for row in rows
+        if (not state or row.state == state)
+        and (wanted is None or wanted.intersection(row.genres or ()))
+        and (seeking is None or bool(row.seeking) == seeking)
+    ]
+    genres, states = {}, {}
+    for row in matches:
+        states[row.state] = states.get(row.state, 0) + 1
+        for key in {canonical_genre(genre) for genre in row.genres or ()}:
+            genres[key] = genres.get(key, 0) + 1
+    data = heapq.nsmallest(offset + limit, matches, key=lambda row: (row.name, row.id))[offset:]
+    return data, len(matches), genres, states
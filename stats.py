@@ -0,0 +1,74 @@
+from sqlalchemy.dialects import postgresql, sqlite
+
+from model import db, Artist, ArtistStats, Show, Venue, VenueStats
+
+#----------------------------------------------------------------------------#
+# Show statistics.
+#----------------------------------------------------------------------------#
+
+# The upcoming and past show counts of every venue and artist are kept in
+# venue_stats and artist_stats, so listings show them without counting. Show
+# writes recompute the rows of their venue and artist in the same transaction
+# and refresh_show_stats, run on a schedule, picks up the shows that started
+# since, from the rows whose next_show_at has passed
+
+STATS = {Venue: (VenueStats, Show.venue_id), Artist: (ArtistStats, Show.artist_id)}
+
+def stats_select(model, now):
+    #Output = select() of the stats columns of every venue or artist, counted
+    # from the show table
+    stats, key = STATS[model]
+    return (
+        db.select(
+            model.id,
+            db.func.count(Show.id).filter(Show.start_time > now),
+            db.func.count(Show.id).filter(Show.start_time <= now),
+            db.func.min(Show.start_time).filter(Show.start_time > now),
+        )
+        .select_from(model)
+        .outerjoin(Show, key == model.id)
+        .group_by(model.id)
+    )
+
+def update_show_stats(model, ids, now):
+    #Recomputes the stats rows of the given venues or artists, or of all of
+    # them when ids is None, in the caller's transaction. Each row is counted
+    # on the (key, start_time) index of show
+    #The venue or artist rows are locked first, in id order, so concurrent
+    # recomputations of one row (show writes, which also lock it by touching
+    # it, and refresh_show_stats) run one after the other and each counts the
+    # shows the one before committed. The rows are then upserted, never
+    # deleted and inserted again, so two writers cannot collide on them
+    stats, _ = STATS[model]
+    # SQLite needs a WHERE in the SELECT of an INSERT ... ON CONFLICT
+    statement = stats_select(model, now).where(db.true())
+    if ids is not None:
+        db.session.execute(
+            db.select(model.id).where(model.id.in_(ids)).order_by(model.id).with_for_update()
+        ).all()
+        statement = statement.where(model.id.in_(ids))
+    insert = (postgresql if db.engine.dialect.name == 'postgresql' else sqlite).insert(stats.__table__)
+    insert = insert.from_select(
+        ['id', 'upcoming_shows_count', 'past_shows_count', 'next_show_at'], statement,
+    )
+    db.session.execute(insert.on_conflict_do_update(
+        index_elements=['id'],
+        set_={
+            name: insert.excluded[name]
+            for name in ('upcoming_shows_count', 'past_shows_count', 'next_show_at')
+        },
+    ))
+
+def refresh_show_stats(model, now):
+    #Recomputes the rows whose next upcoming show has started
+    #Output = ids of the venues or artists whose counts changed
+    stats, _ = STATS[model]
+    ids = [id for id, in db.session.query(stats.id).filter(stats.next_show_at <= now)]
+    if ids:
+        update_show_stats(model, ids, now)
+    return ids
+
+def rebuild_show_stats(now):
+    #Recomputes every row, e.g. after a bulk import of shows
+    update_show_stats(Venue, None, now)
+    update_show_stats(Artist, None, now)
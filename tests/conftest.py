@@ -0,0 +1,98 @@
+#----------------------------------------------------------------------------#
+# Test fixtures.
+#
+# The suite runs on a throwaway SQLite file by default. Point it at an empty
+# PostgreSQL database (with pg_trgm available) to also run the tests that
+# need one, e.g. the search parity tests:
+#
+#   TEST_DATABASE_URL=postgresql://localhost/fyyur_test python -m pytest
+#
+# Every table is dropped and created again for each test.
+#----------------------------------------------------------------------------#
+
+import os
+import sys
+import tempfile
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import event
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+# config.py reads the environment when it is imported, so this comes first
+DATABASE_URL = os.environ.get('TEST_DATABASE_URL') or 'sqlite:///' + os.path.join(
+    tempfile.mkdtemp(prefix='fyyur-test-'), 'fyyur.db')
+os.environ['DATABASE_URL'] = DATABASE_URL
+os.environ['JOBS_BACKEND'] = 'inline'
+
+import app as fyyur
+from model import db, Artist, Show, Venue
+
+POSTGRESQL = DATABASE_URL.startswith('postgres')
+
+@pytest.fixture(scope='session')
+def app():
+    app = fyyur.create_app()
+    app.config.update(TESTING=True, WTF_CSRF_ENABLED=False)
+    if not POSTGRESQL:
+        # SQLite has no ARRAY type, store genres as JSON
+        for model in (Venue, Artist):
+            model.__table__.c.genres.type = db.JSON()
+    return app
+
+@pytest.fixture(autouse=True)
+def database(app):
+    with app.app_context():
+        if POSTGRESQL:
+            db.session.execute(db.text('CREATE EXTENSION IF NOT EXISTS pg_trgm'))
+            db.session.commit()
+        db.drop_all()
+        db.create_all()
+        app.extensions['cache'].clear()
+        if app.jinja_env.fragment_cache is not None:
+            app.jinja_env.fragment_cache.clear()
+        yield db
+        db.session.remove()
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+@pytest.fixture
+def count_queries(app):
+    #Output = context manager yielding a list that collects the statements
+    # run inside it
+    @contextmanager
+    def counter():
+        statements = []
+        listener = lambda conn, cursor, statement, *args: statements.append(statement)
+        engine = db.get_engine(app)
+        event.listen(engine, 'after_cursor_execute', listener)
+        try:
+            yield statements
+        finally:
+            event.remove(engine, 'after_cursor_execute', listener)
+    return counter
+
+def add_venue(name='The Musical Hop', city='San Francisco', state='CA', genres=('Jazz',), **values):
+    venue = Venue(name=name, city=city, state=state, address='1015 Folsom Street', genres=list(genres), **values)
+    db.session.add(venue)
+    db.session.commit()
+    return venue
+
+def add_artist(name='Guns N Petals', city='San Francisco', state='CA', genres=('Rock_n_Roll',), **values):
+    artist = Artist(name=name, city=city, state=state, genres=list(genres), **values)
+    db.session.add(artist)
+    db.session.commit()
+    return artist
+
+def add_show(venue, artist, days):
+    #Adds a show starting days from now, in the past when days is negative
+    show = Show(venue_id=venue.id, artist_id=artist.id,
+                start_time=datetime.now(timezone.utc) + timedelta(days=days))
+    db.session.add(show)
+    db.session.commit()
+    return show
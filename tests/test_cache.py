@@ -0,0 +1,90 @@
+import fnmatch
+import time
+
+import pytest
+
+from cache import RedisCache
+from conftest import add_artist, add_show, add_venue
+from model import db, Show
+
+class FakeRedis:
+    #The part of redis.Redis that RedisCache uses, kept in a dict
+    def __init__(self):
+      self.data = {}
+
+    def get(self, key):
+      value, expires = self.data.get(key, (None, None))
+      if expires is not None and expires <= time.monotonic():
+          del self.data[key]
+          return None
+      return value
+
+    def set(self, key, value, ex=None):
+      self.data[key] = (value, time.monotonic() + ex if ex else None)
+
+    def delete(self, *keys):
+      for key in keys:
+          self.data.pop(key, None)
+
+    def scan_iter(self, pattern):
+      return [key for key in list(self.data) if fnmatch.fnmatchcase(key, pattern)]
+
+@pytest.fixture
+def redis(app, monkeypatch):
+    client = FakeRedis()
+    monkeypatch.setitem(app.extensions, 'cache', RedisCache(client, ttl=60))
+    return client
+
+def venue_form(**values):
+    data = dict(name='The Musical Hop', city='San Francisco', state='CA', address='1015 Folsom Street',
+                phone='', genres='Jazz', facebook_link='', image_link='', website_link='',
+                seeking_description='')
+    data.update(values)
+    return data
+
+def artist_form(**values):
+    data = dict(name='Guns N Petals', city='San Francisco', state='CA', phone='', genres='Jazz',
+                facebook_link='', image_link='', website_link='', seeking_description='')
+    data.update(values)
+    return data
+
+@pytest.fixture
+def pages(client, redis):
+    #A venue and an artist sharing a show, both pages cached
+    venue, artist = add_venue(), add_artist()
+    add_show(venue, artist, 1)
+    assert client.get('/venues/1').status_code == 200
+    assert client.get('/artists/1').status_code == 200
+    assert set(redis.data) == {'fyyur:venue:1', 'fyyur:artist:1'}
+
+def test_venue_edit_invalidates_the_venue_and_its_artists(client, redis, pages):
+    assert client.post('/venues/1/edit', data=venue_form(name='The Musical Hop Renamed')).status_code == 302
+    assert redis.data == {}
+    assert b'The Musical Hop Renamed' in client.get('/venues/1').data
+    assert b'The Musical Hop Renamed' in client.get('/artists/1').data
+
+def test_artist_edit_invalidates_the_artist_and_its_venues(client, redis, pages):
+    assert client.post('/artists/1/edit', data=artist_form(name='Guns N Roses')).status_code == 302
+    assert redis.data == {}
+    assert b'Guns N Roses' in client.get('/artists/1').data
+    assert b'Guns N Roses' in client.get('/venues/1').data
+
+def test_new_show_invalidates_its_venue_and_artist(client, redis, pages):
+    client.post('/shows/create', data={'venue_id': '1', 'artist_id': '1', 'start_time': '2035-05-21 21:30:00'})
+    assert redis.data == {}
+    assert b'2 Upcoming Shows' in client.get('/venues/1').data
+
+def test_venue_delete_invalidates_the_venue(client, redis, pages):
+    # Venues with shows cannot be deleted, the show.venue_id foreign key
+    # holds them (SQLite just does not enforce it)
+    Show.query.filter_by(venue_id=1).delete()
+    db.session.commit()
+    client.post('/venues/1/delete')
+    assert 'fyyur:venue:1' not in redis.data
+    assert client.get('/venues/1').status_code == 404
+
+def test_unrelated_pages_stay_cached(client, redis, pages):
+    add_venue(name='Park Square Live Music & Coffee')
+    assert client.get('/venues/2').status_code == 200
+    client.post('/venues/1/edit', data=venue_form(name='Renamed'))
+    assert 'fyyur:venue:2' in redis.data
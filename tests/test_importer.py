@@ -0,0 +1,62 @@
+from exporter import export_command
+from importer import import_command
+from model import Artist, Show, Venue
+
+from conftest import add_artist, add_show, add_venue
+
+def test_shows_reference_the_ids_of_their_files(app, tmp_path):
+    venues = tmp_path / 'venues.csv'
+    venues.write_text(
+        'id,name,city,state,address,genres,facebook_link,seeking_talent\n'
+        '10,The Musical Hop,San Francisco,CA,1015 Folsom Street,Jazz;Reggae,https://fb.com/hop,yes\n'
+        '20,Park Square Live Music & Coffee,San Francisco,CA,34 Whiskey Moore Ave,Jazz,https://fb.com/park,\n'
+        '30,Nowhere,Nowhere,XX,1 Main Street,Jazz,https://fb.com/nowhere,\n'
+    )
+    artists = tmp_path / 'artists.jsonl'
+    artists.write_text('{"id": 7, "name": "Guns N Petals", "city": "San Francisco", "state": "CA", "genres":'
+                       ' ["Rock_n_Roll"], "facebook_link": "https://fb.com/guns"}\n')
+    shows = tmp_path / 'shows.csv'
+    shows.write_text(
+        'id,venue_id,artist_id,start_time\n'
+        '1,20,7,2035-05-21 21:30:00\n'
+        '2,30,7,2035-05-22 21:30:00\n'
+    )
+    result = app.test_cli_runner().invoke(
+        import_command, ['--venues', str(venues), '--artists', str(artists), '--shows', str(shows)])
+    assert result.exit_code == 0, result.output
+    # The venue in state XX is rejected, and so is the show that plays there
+    assert [(venue.name, venue.genres, venue.seeking_talent) for venue in Venue.query.order_by(Venue.id)] == [
+        ('The Musical Hop', ['Jazz', 'Reggae'], True),
+        ('Park Square Live Music & Coffee', ['Jazz'], False),
+    ]
+    artist = Artist.query.one()
+    assert [(show.venue_id, show.artist_id) for show in Show.query] == [(2, artist.id)]
+
+def test_show_rows_without_start_time_are_rejected(app, tmp_path):
+    add_venue(), add_artist()
+    shows = tmp_path / 'shows.csv'
+    shows.write_text(
+        'id,venue_id,artist_id,start_time\n'
+        '1,1,1,2035-05-21 21:30:00\n'
+        '2,1,1,\n'
+        '3,1,1\n'
+    )
+    result = app.test_cli_runner().invoke(import_command, ['--shows', str(shows)])
+    assert result.exit_code == 0, result.output
+    assert [show.start_time.year for show in Show.query] == [2035]
+
+def test_exported_shows_import_again(app, tmp_path):
+    # The export writes ISO 8601 start times, with microseconds and, from
+    # PostgreSQL, a UTC offset, which ShowForm alone does not read
+    show = add_show(add_venue(), add_artist(), 30)
+    start_time = show.start_time
+    runner = app.test_cli_runner()
+    for format in ('csv', 'jsonl'):
+        path = tmp_path / 'shows.{}'.format(format)
+        result = runner.invoke(export_command, ['shows', '--format', format, '--output', str(path)])
+        assert result.exit_code == 0, result.output
+        result = runner.invoke(import_command, ['--shows', str(path)])
+        assert result.exit_code == 0, result.output
+    times = [show.start_time for show in Show.query.order_by(Show.id)]
+    assert len(times) == 4 and len(set(times)) == 1
+    assert times[0].replace(tzinfo=None) == start_time.replace(tzinfo=None)
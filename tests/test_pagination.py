@@ -0,0 +1,42 @@
+import json
+import re
+from base64 import urlsafe_b64encode
+from urllib.parse import unquote
+
+import pytest
+
+from conftest import add_artist, add_show, add_venue
+
+def cursor(values):
+    return urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+BAD_CURSORS = ['!!!', cursor({}), cursor([1]), cursor([1, 2]), cursor(['x', [1]]),
+               cursor(['2035-01-01T00:00:00', 'a']), cursor(['2035-01-01T00:00:00', True]),
+               cursor([None, 1])]
+
+@pytest.mark.parametrize('url', ['/shows', '/shows?stream=1', '/api/v1/shows', '/artists'])
+@pytest.mark.parametrize('value', BAD_CURSORS)
+def test_malformed_cursors_are_rejected(client, url, value):
+    separator = '&' if '?' in url else '?'
+    assert client.get(url + separator + 'cursor=' + value).status_code == 400
+
+def test_show_cursors_need_a_timestamp(client):
+    assert client.get('/shows?cursor=' + cursor(['not a date', 1])).status_code == 400
+
+@pytest.mark.parametrize('stream', ['', '1'])
+def test_shows_pages_follow_the_cursor(app, client, monkeypatch, stream):
+    monkeypatch.setitem(app.config, 'SHOWS_PER_PAGE', 2)
+    venue = add_venue()
+    for day in range(5):
+        add_show(venue, add_artist(name='Artist {}'.format(day)), day + 1)
+    seen, query_string = [], {'stream': stream}
+    while True:
+        response = client.get('/shows', query_string=query_string)
+        assert response.status_code == 200
+        page = response.get_data(as_text=True)
+        seen += re.findall(r'>(Artist \d)</a>', page)
+        next_cursor = re.search(r'cursor=([^&"]+)', page)
+        if next_cursor is None:
+            break
+        query_string = {'cursor': unquote(next_cursor.group(1)), 'stream': stream}
+    assert seen == ['Artist {}'.format(day) for day in range(5)]
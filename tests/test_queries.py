@@ -0,0 +1,35 @@
+from conftest import add_artist, add_show, add_venue
+
+# The listings and detail pages read their rows in a fixed number of
+# queries, however many venues, areas and shows there are
+
+def seed(venues, shows_per_venue):
+    artist = add_artist()
+    for i in range(venues):
+        venue = add_venue(name='Venue {}'.format(i), city='City {}'.format(i % 5))
+        for day in range(shows_per_venue):
+            add_show(venue, artist, day - shows_per_venue // 2)
+    return artist
+
+def queries(client, count_queries, url):
+    with count_queries() as statements:
+        assert client.get(url).status_code == 200
+    return len(statements)
+
+def test_venues_query_count_is_constant(client, count_queries):
+    seed(2, 1)
+    few = queries(client, count_queries, '/venues')
+    seed(30, 3)
+    assert queries(client, count_queries, '/venues') == few
+
+def test_venue_page_query_count_is_constant(client, count_queries):
+    seed(2, 1)
+    few = queries(client, count_queries, '/venues/1')
+    seed(1, 20)
+    assert queries(client, count_queries, '/venues/3') == few
+
+def test_artist_page_query_count_is_constant(client, count_queries):
+    artist = seed(1, 1)
+    few = queries(client, count_queries, '/artists/{}'.format(artist.id))
+    artist = seed(10, 3)
+    assert queries(client, count_queries, '/artists/{}'.format(artist.id)) == few
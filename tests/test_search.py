@@ -0,0 +1,79 @@
+import pytest
+
+from conftest import POSTGRESQL, add_artist, add_venue
+from model import Artist, Venue
+from search import browse, browse_postgresql, browse_python, search, search_postgresql, search_python
+
+TERMS = ['hop', 'Hop', 'music', 'san', 'CA', 'ny', 'jazz', 'Hip-Hop', 'hip_hop', 'rock n roll',
+         '50%', 'a_b', 'zzz', '']
+
+def seed():
+    add_venue('The Musical Hop', 'San Francisco', 'CA', ('Jazz', 'Reggae'))
+    add_venue('Park Square Live Music & Coffee', 'San Francisco', 'CA', ('Rock n Roll', 'Jazz'))
+    add_venue('The Dueling Pianos Bar', 'New York', 'NY', ('Classical', 'R&B', 'Hip_Hop'))
+    add_venue('50% Off Hall', 'Hopewell', 'NJ', ('Folk',))
+    add_venue('a_b Lounge', 'Austin', 'TX', ('Hip-Hop',))
+    add_artist('Guns N Petals', 'San Francisco', 'CA', ('Rock_n_Roll',))
+    add_artist('Matt Quevedo', 'New York', 'NY', ('Jazz',))
+    add_artist('The Wild Sax Band', 'San Francisco', 'CA', ('Jazz', 'Classical'))
+    add_artist('Hopscotch', 'Portland', 'OR', ('Hip-Hop',))
+
+def names(response):
+    return [result.name for result in response.data]
+
+def test_search_matches_name_city_state_and_genre(app):
+    seed()
+    assert names(search(Venue, 'hop', 10)) == ['The Musical Hop', '50% Off Hall']
+    assert set(names(search(Venue, 'ny', 10))) == {'The Dueling Pianos Bar'}
+    # Genres match by enum name or value, whichever the row stores
+    assert set(names(search(Venue, 'hip-hop', 10))) == {'The Dueling Pianos Bar', 'a_b Lounge'}
+    # LIKE wildcards in the term are literal
+    assert names(search(Venue, '50%', 10)) == ['50% Off Hall']
+    assert names(search(Venue, 'a_b', 10)) == ['a_b Lounge']
+
+def test_search_pages_count_every_match(app):
+    seed()
+    first = search(Artist, 'san', 1, page=1)
+    assert first.count == 2 and len(first.data) == 1 and first.has_next
+    last = search(Artist, 'san', 1, page=2)
+    assert last.count == 2 and len(last.data) == 1 and not last.has_next
+    # Past the last page there are no rows, but the count still holds
+    beyond = search(Artist, 'san', 1, page=5)
+    assert beyond.count == 2 and beyond.data == [] and not beyond.has_next
+
+@pytest.mark.skipif(not POSTGRESQL, reason='needs TEST_DATABASE_URL on PostgreSQL with pg_trgm')
+@pytest.mark.parametrize('model', [Venue, Artist])
+@pytest.mark.parametrize('term', TERMS)
+def test_search_matches_the_python_fallback(app, model, term):
+    # search_python is what SQLite runs, it must match and rank like pg_trgm
+    seed()
+    for limit, offset, paginated in ((10, 0, False), (2, 0, True), (2, 2, True), (2, 20, True)):
+        expected, expected_count = search_python(model, term, limit, offset, paginated)
+        data, count = search_postgresql(model, term, limit, offset, paginated)
+        assert [(row.id, row.name) for row in data] == [(row.id, row.name) for row in expected]
+        assert count == expected_count
+
+def test_browse_counts_each_genre_once_per_row(app):
+    seed()
+    # Both spellings of Hip-Hop on one venue
+    add_venue('Both Spellings', 'Austin', 'TX', ('Hip_Hop', 'Hip-Hop'))
+    response = browse(Venue, 10, genre='hip-hop')
+    assert response.count == 3
+    assert response.genres == {'Hip_Hop': 3, 'Classical': 1, 'RandB': 1}
+    assert response.states == {'TX': 2, 'NY': 1}
+
+@pytest.mark.skipif(not POSTGRESQL, reason='needs TEST_DATABASE_URL on PostgreSQL')
+@pytest.mark.parametrize('model', [Venue, Artist])
+@pytest.mark.parametrize('filters', [{}, {'state': 'CA'}, {'genre': 'Hip-Hop'}, {'genre': 'jazz', 'seeking': False}])
+def test_browse_matches_the_python_fallback(app, model, filters):
+    # browse_python is what SQLite runs, it must filter and count like the
+    # grouping sets query
+    seed()
+    add_venue('Both Spellings', 'Austin', 'TX', ('Hip_Hop', 'Hip-Hop', 'jazz'))
+    add_artist('Both Spellings', 'Austin', 'TX', ('Rock n Roll', 'Rock_n_Roll'))
+    arguments = dict(state=None, genre=None, seeking=None, **filters)
+    for limit, offset in ((10, 0), (2, 2)):
+        data, count, genres, states = browse_postgresql(model, limit, offset, **arguments)
+        expected, expected_count, expected_genres, expected_states = browse_python(model, limit, offset, **arguments)
+        assert [(row.id, row.name) for row in data] == [(row.id, row.name) for row in expected]
+        assert (count, genres, states) == (expected_count, expected_genres, expected_states)
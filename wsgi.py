@@ -0,0 +1,18 @@
+#----------------------------------------------------------------------------#
+# WSGI entry point for production servers:
+#
+#   gunicorn wsgi:app
+#
+# gunicorn reads its settings from gunicorn.conf.py next to this file.
+#----------------------------------------------------------------------------#
+
+import time
+
+started = time.perf_counter()
+
+from app import create_app
+
+app = create_app()
+
+# Seconds spent importing and configuring the app, logged by gunicorn.conf.py
+load_seconds = time.perf_counter() - started